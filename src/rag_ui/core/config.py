@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,5 +30,244 @@ class Config:
     @property
     def EMBED_NGROK_URL(self):
         return os.getenv("EMBED_NGROK_URL")
+
+    @property
+    def STREAM_RESPONSES(self):
+        return os.getenv("STREAM_RESPONSES", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def INTENT_CENTROIDS(self):
+        # Nearest-centroid intent tier over the query embedding
+        return os.getenv("INTENT_CENTROIDS", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def ANSWER_WORKERS(self):
+        # Chat answers generated concurrently in the background
+        return int(os.getenv("ANSWER_WORKERS", 4))
+
+    @property
+    def ANSWER_QUEUE_SIZE(self):
+        # Chat answers queued or running before new messages are refused
+        return int(os.getenv("ANSWER_QUEUE_SIZE", 16))
+
+    @property
+    def MARKER_IDLE_TIMEOUT(self):
+        # Seconds before idle Marker models are unloaded, 0 keeps them loaded
+        return float(os.getenv("MARKER_IDLE_TIMEOUT", 600))
+
+    @property
+    def CONVERSION_CACHE_DIR(self):
+        return os.getenv("CONVERSION_CACHE_DIR", "./src/rag_ui/data/conversion-cache/")
+    @property
+    def CONVERSION_CACHE_MAX_BYTES(self):
+        return int(os.getenv("CONVERSION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+    @property
+    def EMBED_CACHE_PATH(self):
+        return os.getenv("EMBED_CACHE_PATH", "./src/rag_ui/data/embedding-cache.sqlite")
+    @property
+    def EMBED_CACHE_MAX_ENTRIES(self):
+        return int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 200000))
+    @property
+    def EMBED_BATCH_SIZE(self):
+        return int(os.getenv("EMBED_BATCH_SIZE", 32))
+    @property
+    def EMBED_MAX_IN_FLIGHT(self):
+        return int(os.getenv("EMBED_MAX_IN_FLIGHT", 4))
+    @property
+    def EMBED_TIMEOUT(self):
+        return float(os.getenv("EMBED_TIMEOUT", 60))
+
+    @property
+    def WEB_CACHE_PATH(self):
+        return os.getenv("WEB_CACHE_PATH", "./src/rag_ui/data/web-cache.sqlite")
+    @property
+    def WEB_CACHE_TTL(self):
+        # Seconds before a cached page is revalidated with a conditional GET
+        return float(os.getenv("WEB_CACHE_TTL", 3600))
+    @property
+    def WEB_CACHE_MAX_BYTES(self):
+        return int(os.getenv("WEB_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    @property
+    def THUMBNAIL_CACHE_DIR(self):
+        return os.getenv("THUMBNAIL_CACHE_DIR", "./src/rag_ui/data/thumbnail-cache/")
+    @property
+    def THUMBNAIL_CACHE_MAX_BYTES(self):
+        return int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+    @property
+    def THUMBNAIL_SIZE(self):
+        # Longest side in pixels, twice the 120px product cards for high density screens
+        return int(os.getenv("THUMBNAIL_SIZE", 240))
+    @property
+    def THUMBNAIL_MAX_SOURCE_BYTES(self):
+        # Larger source images are not thumbnailed, the browser gets the original
+        return int(os.getenv("THUMBNAIL_MAX_SOURCE_BYTES", 10 * 1024 * 1024))
+    @property
+    def THUMBNAIL_SECRET(self):
+        # Signs thumbnail urls so the route only proxies images the app linked to.
+        # Every worker and host serving the app must share it; when empty, a random
+        # key is kept in THUMBNAIL_CACHE_DIR (see thumbnail.load_secret)
+        return os.getenv("THUMBNAIL_SECRET", "")
+    @property
+    def WEB_MAX_BYTES(self):
+        # Pages are truncated after this many bytes
+        return int(os.getenv("WEB_MAX_BYTES", 5 * 1024 * 1024))
+
+    @property
+    def SUMMARY_SINGLE_PASS_TOKENS(self):
+        # Longer pages are summarized map-reduce
+        return int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", 3000))
+    @property
+    def SUMMARY_SECTION_TOKENS(self):
+        return int(os.getenv("SUMMARY_SECTION_TOKENS", 1500))
+    @property
+    def SUMMARY_MAX_SECTIONS(self):
+        # Sections summarized per page, the rest of longer pages is skipped
+        return int(os.getenv("SUMMARY_MAX_SECTIONS", 24))
+    @property
+    def SUMMARY_MAX_LEVELS(self):
+        # Rounds of summarizing the partial summaries again until they fit
+        return int(os.getenv("SUMMARY_MAX_LEVELS", 3))
+    @property
+    def SUMMARY_WORKERS(self):
+        # Sections summarized concurrently
+        return int(os.getenv("SUMMARY_WORKERS", 4))
+
+    @property
+    def ANSWER_CACHE_THRESHOLD(self):
+        # Cosine similarity above which a cached answer is reused
+        return float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+    @property
+    def ANSWER_CACHE_MAX_ENTRIES(self):
+        return int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1024))
+    @property
+    def ANSWER_CACHE_TTL(self):
+        # Seconds, 0 disables the answer cache
+        return float(os.getenv("ANSWER_CACHE_TTL", 3600))
+
+    @property
+    def RETRIEVAL_TOP_K(self):
+        # Chunks retrieved as context for an answer
+        return int(os.getenv("RETRIEVAL_TOP_K", 3))
+    @property
+    def RETRIEVAL_CACHE_MAX_ENTRIES(self):
+        return int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", 512))
+
+    @property
+    def HYBRID_SEARCH(self):
+        # Fuse BM25 hits from the local lexical index with the vector hits (see
+        # lexical.score_fusion). On lexical.benchmark_hybrid, queries naming a product
+        # code reach recall@3 1.0 fused against 0.01 for vectors alone
+        return os.getenv("HYBRID_SEARCH", "true").lower() in ("1", "true", "yes")
+    @property
+    def HYBRID_ALPHA(self):
+        # Weight of the vector similarity in the fused score, BM25 gets the rest
+        return float(os.getenv("HYBRID_ALPHA", 0.5))
+    @property
+    def LEXICAL_INDEX_DIR(self):
+        return os.getenv("LEXICAL_INDEX_DIR", "./src/rag_ui/db/lexical/")
+
+    @property
+    def RERANK_CANDIDATES(self):
+        # Chunks fetched per search before MMR picks RETRIEVAL_TOP_K of them
+        return int(os.getenv("RERANK_CANDIDATES", 20))
+    @property
+    def MMR_LAMBDA(self):
+        # 1 ranks by relevance only, lower values favour diverse chunks
+        return float(os.getenv("MMR_LAMBDA", 0.7))
+    @property
+    def CONTEXT_TOKEN_BUDGET(self):
+        # Tokens of retrieved chunks picked by MMR
+        return int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+    @property
+    def PROMPT_TOKEN_BUDGET(self):
+        # Tokens of question, history and context packed into the prompt
+        return int(os.getenv("PROMPT_TOKEN_BUDGET", 4000))
+    @property
+    def PRODUCT_SEARCH_ROWS(self):
+        # Products shown per search, and per "show more"
+        return int(os.getenv("PRODUCT_SEARCH_ROWS", 3))
+    @property
+    def PRODUCT_SEARCH_PAGE_SIZE(self):
+        # Products requested from websosanh.vn per call
+        return int(os.getenv("PRODUCT_SEARCH_PAGE_SIZE", 12))
+    @property
+    def PRODUCT_SEARCH_TIMEOUT(self):
+        return float(os.getenv("PRODUCT_SEARCH_TIMEOUT", 10))
+    @property
+    def PRODUCT_SEARCH_CACHE_TTL(self):
+        return int(os.getenv("PRODUCT_SEARCH_CACHE_TTL", 900))
+    @property
+    def PRODUCT_SEARCH_CACHE_MAX_ENTRIES(self):
+        return int(os.getenv("PRODUCT_SEARCH_CACHE_MAX_ENTRIES", 512))
+    @property
+    def CHAT_NUM_CTX(self):
+        # Context window of every LLM_MODEL call, 0 keeps the Ollama default
+        return int(os.getenv("CHAT_NUM_CTX", 8192))
+    @property
+    def CHAT_KEEP_ALIVE(self):
+        # How long Ollama keeps the model, and its prompt cache, loaded: seconds or a duration like "30m"
+        keep_alive = os.getenv("CHAT_KEEP_ALIVE", "-1")
+        return int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+    @property
+    def CHAT_SESSION_TTL(self):
+        return int(os.getenv("CHAT_SESSION_TTL", 3600))
+    @property
+    def TOKENIZER_NAME(self):
+        # Hugging Face tokenizer of LLM_MODEL, token counts are estimated when empty
+        return os.getenv("TOKENIZER_NAME", "")
+    @property
+    def RELEVANCE_THRESHOLD(self):
+        # Minimum cosine similarity of the best chunk, below it no context is sent
+        return float(os.getenv("RELEVANCE_THRESHOLD", 0.0))
+
+    @property
+    def VECTOR_BACKEND(self):
+        # "milvus" or "numpy"
+        return os.getenv("VECTOR_BACKEND", "milvus").lower()
+    @property
+    def MILVUS_URI(self):
+        return os.getenv("MILVUS_URI", "./src/rag_ui/db/milvus.db")
+    @property
+    def MILVUS_INDEX_TYPE(self):
+        # HNSW, IVF_FLAT, IVF_SQ8, IVF_PQ, FLAT or AUTOINDEX, used for new collections
+        return os.getenv("MILVUS_INDEX_TYPE", "HNSW")
+    @property
+    def MILVUS_INDEX_PARAMS(self):
+        # JSON build params, e.g. {"M": 16, "efConstruction": 200}, defaults depend on the index type
+        params = os.getenv("MILVUS_INDEX_PARAMS")
+        return json.loads(params) if params else None
+    @property
+    def MILVUS_SEARCH_EF(self):
+        return int(os.getenv("MILVUS_SEARCH_EF", 64))
+    @property
+    def MILVUS_SEARCH_NPROBE(self):
+        return int(os.getenv("MILVUS_SEARCH_NPROBE", 16))
+    @property
+    def MILVUS_PARTITION_KEY(self):
+        # Partition new collections by file_path
+        return os.getenv("MILVUS_PARTITION_KEY", "true").lower() in ("1", "true", "yes")
+    @property
+    def MILVUS_NUM_PARTITIONS(self):
+        return int(os.getenv("MILVUS_NUM_PARTITIONS", 16))
+    @property
+    def VECTOR_STORE_DIR(self):
+        return os.getenv("VECTOR_STORE_DIR", "./src/rag_ui/db/vectors/")
+    @property
+    def VECTOR_IVF_LISTS(self):
+        # IVF partitions of the numpy backend, 0 keeps exact search
+        return int(os.getenv("VECTOR_IVF_LISTS", 0))
+    @property
+    def VECTOR_IVF_NPROBE(self):
+        return int(os.getenv("VECTOR_IVF_NPROBE", 8))
+
+    @property
+    def INGEST_CONVERT_WORKERS(self):
+        # Each worker process loads its own Marker models when it starts, a few GB
+        # of RAM (or VRAM) per worker
+        return int(os.getenv("INGEST_CONVERT_WORKERS", 2))
+    @property
+    def INGEST_MANIFEST_PATH(self):
+        return os.getenv("INGEST_MANIFEST_PATH", "./src/rag_ui/db/manifest.sqlite")
     
 config = Config()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+class JobQueueFull(Exception):
+    """Raised when the job manager already holds its maximum of unfinished jobs."""
+
+class JobCancelled(Exception):
+    """Raised by a job that noticed its cancellation."""
+
+class Job:
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.future = None
+        self.cancel_event = threading.Event()
+        self.started = False
+        self.finished_at = None
+
+class JobManager:
+    """
+    In-process background jobs on a bounded worker pool.
+
+    submit() returns a job id straight away, so a Dash callback can hand slow work
+    to the pool and return; status() is polled for the result. At most 'max_pending'
+    jobs may be queued or running, and finished jobs are forgotten after 'ttl' seconds.
+    Jobs are called as fn(cancel_event, *args, **kwargs) and should check the event
+    between their steps to honour cancel().
+    """
+    def __init__(self, max_workers: int, max_pending: int, ttl: float = 600):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _cleanup(self):
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.future.done())
+
+    def submit(self, fn, *args, **kwargs) -> str:
+        with self._lock:
+            self._cleanup()
+            if self._pending() >= self.max_pending:
+                raise JobQueueFull(f"{self.max_pending} jobs are already waiting")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+
+            def run():
+                job.started = True
+                if job.cancel_event.is_set():
+                    raise JobCancelled()
+                return fn(job.cancel_event, *args, **kwargs)
+
+            job.future = self._executor.submit(run)
+            job.future.add_done_callback(lambda _: setattr(job, "finished_at", time.monotonic()))
+            return job.id
+
+    def status(self, job_id: str) -> dict:
+        """
+        Returns:
+            {"status": "unknown" | "queued" | "running" | "done" | "failed" | "cancelled",
+             "result": job result when done, "error": message when failed}
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return {"status": "unknown"}
+        future = job.future
+        if not future.done():
+            return {"status": "running" if job.started else "queued"}
+        try:
+            return {"status": "done", "result": future.result()}
+        except (CancelledError, JobCancelled):
+            return {"status": "cancelled"}
+        except Exception as e:
+            return {"status": "failed", "error": str(e)}
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job, or ask a running one to stop at its next check."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.future.done():
+            return False
+        job.cancel_event.set()
+        job.future.cancel()
+        return True
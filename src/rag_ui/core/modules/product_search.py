@@ -1,21 +1,25 @@
-import requests
+import re
 import json
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from rag_ui.core.config import config
+from rag_ui.inference.gateway import gateway
 
 WEBSOSANH_URL = "https://websosanh.vn/search-api/get-search-product"
 
-def websosanh_search(keyword: str) -> str:
-    """
-    Fetch products from websosanh.vn based on 'keyword'.
-    Args:
-        keyword (str): The keyword to search for.
-    Returns:
-        str: JSON dumps of list of products (only the first 'limit' products).
-    """
-    limit = 3
-    data = {
+def normalize_keyword(keyword: str) -> str:
+    """Cache key of a search: same text up to case, unicode form and spacing"""
+    keyword = unicodedata.normalize("NFC", keyword).lower()
+    return re.sub(r"\s+", " ", keyword).strip(" \t\n.,;:!?\"'")
+
+def build_search_payload(keyword: str, rows: int = 40, page_index: int = 1) -> dict:
+    return {
         "startOffset":0,
         "numRow":0,
-        "defaultRow":40,
+        "defaultRow":rows,
         "categoryIds":[],
         "merchantIds":[],
         "regionIds":[],
@@ -26,12 +30,12 @@ def websosanh_search(keyword: str) -> str:
         "keyword":keyword,
         "productType":"0",
         "isAppend":True,
-        "pageIndex":1,
+        "pageIndex":page_index,
         "isDesktop":True
     }
-    response = requests.post(WEBSOSANH_URL, json=data)
-    response.raise_for_status()
-    response = response.json()
+
+def parse_products(response: dict, limit: int | None = None) -> list[dict]:
+    """Keep the fields shown in the product cards for the first 'limit' products."""
     products = []
     products_json = response["searchProductModels"][:limit]
     for product in products_json:
@@ -44,5 +48,113 @@ def websosanh_search(keyword: str) -> str:
             'merchantDomain': product['merchantDomain'],
             'provins': product['provins'],
         })
+    return products
+
+class ProductSearchClient:
+    """
+    websosanh.vn search through the gateway (pooled connections, PRODUCT_SEARCH_TIMEOUT),
+    with a TTL cache of result pages keyed by normalized keyword.
+
+    Results are fetched one page of 'page_size' products at a time, only when a
+    caller asks for products past the pages already fetched ("show more"), so a
+    first search costs one small request and a popular one none at all.
+    """
+    def __init__(
+            self,
+            url: str = WEBSOSANH_URL,
+            page_size: int = 12,
+            ttl: float = 900,
+            max_entries: int = 512,
+        ):
+        self.url = url
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._pages = OrderedDict() # (keyword, page index) -> (expiry, products)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, keyword: str, page_index: int) -> list[dict] | None:
+        key = (normalize_keyword(keyword), page_index)
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None or entry[0] < time.time():
+                self._pages.pop(key, None)
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def store(self, keyword: str, page_index: int, products: list[dict]):
+        key = (normalize_keyword(keyword), page_index)
+        with self._lock:
+            self._pages[key] = (time.time() + self.ttl, products)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    async def apage(self, keyword: str, page_index: int) -> list[dict]:
+        """Products of one result page, 1-based, from the cache when fresh"""
+        products = self.cached(keyword, page_index)
+        if products is not None:
+            return products
+        payload = build_search_payload(normalize_keyword(keyword), self.page_size, page_index)
+        response = await gateway.post_json("product", self.url, json=payload)
+        products = parse_products(response, self.page_size)
+        self.store(keyword, page_index, products)
+        return products
+
+    def page(self, keyword: str, page_index: int) -> list[dict]:
+        return gateway.run(self.apage(keyword, page_index))
+
+    async def asearch(self, keyword: str, offset: int = 0, limit: int = 3) -> list[dict]:
+        """
+        Products 'offset' to 'offset + limit' of the results for 'keyword',
+        fetching the pages that cover them only.
+        """
+        products = []
+        page_index = offset // self.page_size + 1
+        start = offset % self.page_size
+        while len(products) < limit:
+            page = await self.apage(keyword, page_index)
+            products += page[start:start + limit - len(products)]
+            # A short page is the last one
+            if len(page) < self.page_size:
+                break
+            page_index, start = page_index + 1, 0
+        return products
+
+    def search(self, keyword: str, offset: int = 0, limit: int = 3) -> list[dict]:
+        return gateway.run(self.asearch(keyword, offset, limit))
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pages": len(self._pages), "hits": self.hits, "misses": self.misses}
+
+product_search = ProductSearchClient(
+    page_size=config.PRODUCT_SEARCH_PAGE_SIZE,
+    ttl=config.PRODUCT_SEARCH_CACHE_TTL,
+    max_entries=config.PRODUCT_SEARCH_CACHE_MAX_ENTRIES,
+)
+
+async def awebsosanh_search(keyword: str, offset: int = 0) -> str:
+    """
+    Fetch products from websosanh.vn based on 'keyword'.
+    Args:
+        keyword (str): The keyword to search for.
+        offset (int): Number of products already shown, for "show more".
+    Returns:
+        str: JSON dumps of list of products (PRODUCT_SEARCH_ROWS products from 'offset').
+    """
+    products = await product_search.asearch(keyword, offset=offset, limit=config.PRODUCT_SEARCH_ROWS)
+    return json.dumps(products)
 
-    return json.dumps(products)
\ No newline at end of file
+def websosanh_search(keyword: str, offset: int = 0) -> str:
+    """Sync wrapper of awebsosanh_search for the Dash callbacks"""
+    return gateway.run(awebsosanh_search(keyword, offset))
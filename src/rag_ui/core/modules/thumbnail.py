@@ -0,0 +1,100 @@
+import io
+import os
+import hmac
+import hashlib
+import secrets
+import threading
+from urllib.parse import quote, urlparse
+
+from PIL import Image
+
+from rag_ui.core.config import config
+from rag_ui.core.modules.web import HEADERS
+from rag_ui.inference.gateway import gateway
+from rag_ui.data.cache import thumbnail_cache
+
+SECRET_FILE = "secret.key"
+
+def load_secret() -> bytes:
+    """
+    THUMBNAIL_SECRET, or else a random key created once in THUMBNAIL_CACHE_DIR,
+    so worker processes and restarts sharing that directory sign the same urls.
+    """
+    if config.THUMBNAIL_SECRET:
+        return config.THUMBNAIL_SECRET.encode()
+    os.makedirs(config.THUMBNAIL_CACHE_DIR, exist_ok=True)
+    path = os.path.join(config.THUMBNAIL_CACHE_DIR, SECRET_FILE)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            # The first process to link its key wins, the others read it
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path) as f:
+        return f.read().strip().encode()
+
+THUMBNAIL_SECRET = load_secret()
+
+_fetch_locks = {}
+_fetch_locks_lock = threading.Lock()
+
+def sign_url(url: str) -> str:
+    return hmac.new(THUMBNAIL_SECRET, url.encode(), hashlib.sha256).hexdigest()[:32]
+
+def verify_url(url: str, signature: str) -> bool:
+    return urlparse(url).scheme in ("http", "https") and hmac.compare_digest(sign_url(url), signature)
+
+def thumbnail_url(image_url: str) -> str:
+    """Path of the thumbnail route serving 'image_url' (see ui/app.py)"""
+    if not image_url:
+        return ""
+    return f"/thumbnail/{sign_url(image_url)}?url={quote(image_url, safe='')}"
+
+def make_thumbnail(data: bytes, size: int) -> bytes:
+    """JPEG of the image with its longest side scaled down to 'size' pixels"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (size, size)) # Decodes large JPEGs at a reduced scale
+        # Resized before the mode conversion, which then only touches the small image
+        image.thumbnail((size, size), Image.LANCZOS)
+        image = image.convert("RGBA")
+        # Transparent product shots go on the white of the cards
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        out = io.BytesIO()
+        background.save(out, "JPEG", quality=82, optimize=True, progressive=True)
+    return out.getvalue()
+
+def get_thumbnail(url: str, size: int | None = None) -> bytes:
+    """
+    Thumbnail of the image at 'url', from the disk cache or fetched once and resized.
+    Concurrent requests for the same image wait for a single download.
+    """
+    size = size or config.THUMBNAIL_SIZE
+    key = thumbnail_cache.make_key(url, size)
+    data = thumbnail_cache.get_bytes(key)
+    if data is not None:
+        return data
+
+    with _fetch_locks_lock:
+        lock = _fetch_locks.setdefault(key, threading.Lock())
+    try:
+        with lock:
+            data = thumbnail_cache.get_bytes(key)
+            if data is not None:
+                return data
+            _, _, source = gateway.run(
+                gateway.get_limited("image", url, HEADERS, config.THUMBNAIL_MAX_SOURCE_BYTES + 1)
+            )
+            if len(source) > config.THUMBNAIL_MAX_SOURCE_BYTES:
+                raise ValueError(f"Image larger than {config.THUMBNAIL_MAX_SOURCE_BYTES} bytes")
+            data = make_thumbnail(source, size)
+            thumbnail_cache.put_bytes(key, data)
+            return data
+    finally:
+        with _fetch_locks_lock:
+            _fetch_locks.pop(key, None)
@@ -1,6 +1,14 @@
-import requests
+import asyncio
+
+import httpx
 from bs4 import BeautifulSoup
 
+from rag_ui.core.config import config
+from rag_ui.data.cache import fetch_cache
+from rag_ui.inference.gateway import gateway
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
 def extract_text(text) -> str:
     ret = []
     paragraphs = text.split('\n')
@@ -10,20 +18,47 @@ def extract_text(text) -> str:
             ret.append(paragraph)
     return '\n'.join(ret)
 
-def get_raw(url) -> str:
+def html_to_text(content) -> str:
+    """Parse HTML and keep the paragraphs long enough to be content."""
+    soup = BeautifulSoup(content, 'html.parser')
+    text = soup.get_text()
+    return extract_text(text)
+
+async def aget_raw(url) -> str:
     """
     Get the raw text from the url, optimized for LLM processing.
     Extracts the main content while removing unnecessary elements.
+
+    The extracted text is cached (see data/cache.FetchCache): fresh entries are
+    served without a request, stale ones are revalidated with a conditional GET,
+    and still served when the site cannot be reached or answers with a 5xx.
+    The body is streamed through the gateway and cut at WEB_MAX_BYTES; the cache
+    and the HTML parsing run in worker threads, off the gateway loop.
     """
+    entry = await asyncio.to_thread(fetch_cache.get, url)
+    if entry is not None and entry["fresh"]:
+        return entry["text"]
+
+    headers = {**HEADERS, **fetch_cache.conditional_headers(entry)}
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        text = soup.get_text()
-        clean_text = extract_text(text)
-        return clean_text
-    except Exception as e:
-        raise
\ No newline at end of file
+        status, response_headers, content = await gateway.get_limited("web", url, headers, config.WEB_MAX_BYTES)
+    except (httpx.TransportError, httpx.HTTPStatusError) as e:
+        server_error = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code >= 500
+        if entry is None or not server_error:
+            raise
+        fetch_cache.serve_stale()
+        return entry["text"]
+    if status == 304 and entry is not None:
+        await asyncio.to_thread(fetch_cache.touch, url)
+        return entry["text"]
+    etag = response_headers.get("ETag")
+    last_modified = response_headers.get("Last-Modified")
+
+    # Parse HTML
+    clean_text = await asyncio.to_thread(html_to_text, content)
+    await asyncio.to_thread(fetch_cache.put, url, clean_text, etag, last_modified, entry is not None)
+    return clean_text
+
+def get_raw(url) -> str:
+    """Sync wrapper of aget_raw for the Dash callbacks"""
+    return gateway.run(aget_raw(url))
@@ -0,0 +1,600 @@
+import os
+import time
+import zlib
+import sqlite3
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+import numpy as np
+
+from rag_ui.core.config import config
+
+def file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+class DiskCache:
+    """
+    On-disk cache of byte blobs, one file per key, evicted least-recently-used
+    first once the total size exceeds 'max_bytes'. Recency survives restarts
+    through file mtimes.
+
+    The directory is scanned once at startup; after that each process keeps a
+    running total of the files it knows about, so puts do not list the directory.
+    Several processes (the conversion workers, the server) can share it: a key
+    missing from this process' index is looked up on disk and adopted, and files
+    another process evicted are dropped from the index when they are found missing.
+    """
+    SUFFIX = ".bin"
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size, oldest first
+        self._total = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the index and the total size from the directory. The lock must be held."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, name[:-len(self.SUFFIX)], stat.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total = sum(self._index.values())
+
+    def _touch(self, key: str, size: int):
+        """Mark 'key' as the most recently used, with its current size. The lock must be held."""
+        self._total += size - self._index.pop(key, 0)
+        self._index[key] = size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get_bytes(self, key: str) -> bytes | None:
+        with self._lock:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                # Evicted, possibly by another process
+                self._total -= self._index.pop(key, 0)
+                self.misses += 1
+                return None
+            # Written by another process when not indexed yet
+            self._touch(key, len(data))
+            self.hits += 1
+        return data
+
+    def put_bytes(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            self._touch(key, len(data))
+            self._evict()
+
+    def _evict(self):
+        """Remove the least recently used files until the total fits. The lock must be held."""
+        while self._total > self.max_bytes and self._index:
+            old_key, old_size = self._index.popitem(last=False)
+            self._total -= old_size
+            self.evictions += 1
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total,
+            }
+
+class ConversionCache(DiskCache):
+    """
+    On-disk, content-addressed cache of document-to-markdown conversions.
+
+    Entries are keyed by the hash of the file bytes plus the converter name and
+    version, stored zlib-compressed (see DiskCache for eviction).
+    """
+    SUFFIX = ".md.z"
+
+    @staticmethod
+    def make_key(file_path: str, converter: str, version: str) -> str:
+        h = hashlib.sha256()
+        h.update(file_digest(file_path).encode())
+        h.update(f"\0{converter}\0{version}".encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        return zlib.decompress(data).decode("utf-8")
+
+    def put(self, key: str, text: str):
+        self.put_bytes(key, zlib.compress(text.encode("utf-8")))
+
+    def get_or_convert(self, file_path: str, converter: str, convert) -> str:
+        """
+        Return the cached markdown for 'file_path', running 'convert(file_path)' on a miss.
+        Args:
+            converter: Package name of the converter, its installed version is part of the key.
+        """
+        key = self.make_key(file_path, converter, package_version(converter))
+        text = self.get(key)
+        if text is None:
+            text = convert(file_path)
+            self.put(key, text)
+        return text
+
+class ThumbnailCache(DiskCache):
+    """
+    On-disk cache of product image thumbnails, keyed by source url and size
+    (see DiskCache for eviction).
+    """
+    SUFFIX = ".jpg"
+
+    @staticmethod
+    def make_key(url: str, size: int) -> str:
+        return hashlib.sha256(f"{size}\0{url}".encode()).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embeddings keyed by (model, dimension, text hash).
+
+    Vectors are stored as float32 blobs. Lookups are batched so callers can send
+    only the misses to the embedder, and the least recently used rows are evicted
+    once the table holds more than 'max_entries'.
+    """
+    # Stay below SQLite's default limit on bound variables per statement
+    BATCH = 500
+
+    def __init__(self, db_path: str, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+
+    @staticmethod
+    def make_key(model: str, dim: int, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{dim}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, dim: int, texts: list[str]) -> list[list[float] | None]:
+        """Return the cached embedding of each text, None where it is missing."""
+        keys = [self.make_key(model, dim, text) for text in texts]
+        found = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), self.BATCH):
+                batch = unique_keys[start:start + self.BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+            results = []
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(np.frombuffer(blob, dtype=np.float32).tolist())
+        return results
+
+    def put_many(self, model: str, dim: int, texts: list[str], vectors: list[list[float]]):
+        now = time.time()
+        rows = [
+            (self.make_key(model, dim, text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": count,
+            }
+
+class FetchCache:
+    """
+    Persistent SQLite cache of the text extracted from web pages.
+
+    Each url keeps its zlib-compressed text with the ETag and Last-Modified of
+    the response. Entries younger than 'ttl' seconds are served as they are,
+    older ones are revalidated with a conditional GET by the caller. The least
+    recently used entries are evicted once the compressed texts exceed 'max_bytes'.
+
+    Lookups are counted as hits (fresh), revalidated (304), misses (not cached,
+    or stale and fetched again) and stale (revalidation failed, stale text served).
+    """
+    def __init__(self, db_path: str, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, text BLOB NOT NULL, "
+                "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, last_used REAL NOT NULL, "
+                "size INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)")
+
+    def get(self, url: str) -> dict | None:
+        """
+        Returns:
+            {"text", "etag", "last_modified", "fresh"}, None if the url is not cached;
+            'fresh' is False once the entry is older than the TTL and needs revalidation
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE pages SET last_used = ? WHERE url = ?", (time.time(), url))
+            blob, etag, last_modified, fetched_at = row
+            fresh = time.time() - fetched_at < self.ttl
+            if fresh:
+                self.hits += 1
+        return {
+            "text": zlib.decompress(blob).decode("utf-8"),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": fresh,
+        }
+
+    @staticmethod
+    def conditional_headers(entry: dict | None) -> dict:
+        """Headers turning a GET into a revalidation of 'entry'"""
+        headers = {}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def touch(self, url: str):
+        """The server answered 304 Not Modified, the entry is fresh again"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self.revalidated += 1
+
+    def serve_stale(self):
+        """Revalidation failed and the stale entry is served as it is"""
+        with self._lock:
+            self.stale += 1
+
+    def put(self, url: str, text: str, etag: str | None, last_modified: str | None, stale: bool = False):
+        """
+        Args:
+            stale: The text replaces a stale entry, the lookup counts as a miss
+        """
+        if stale:
+            with self._lock:
+                self.misses += 1
+        blob = zlib.compress(text.encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, text, etag, last_modified, fetched_at, last_used, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, blob, etag, last_modified, now, now, len(blob))
+            )
+            (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+            if total > self.max_bytes:
+                evicted = 0
+                rows = self._conn.execute("SELECT url, size FROM pages ORDER BY last_used").fetchall()
+                for old_url, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM pages WHERE url = ?", (old_url,))
+                    total -= size
+                    evicted += 1
+                self.evictions += evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            lookups = self.hits + self.revalidated + self.misses + self.stale
+            return {
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": count,
+                "bytes": size,
+            }
+
+class AnswerCache:
+    """
+    In-memory semantic cache of chat answers.
+
+    An entry holds the query embedding, the ids of the chunks retrieved for it and
+    the answer. A lookup returns the answer of the most similar entry when the
+    cosine similarity reaches 'threshold', the same chunks were retrieved and the
+    conversation scope (model and previous messages) matches. Entries expire after
+    'ttl' seconds, the least recently used are evicted beyond 'max_entries', and
+    invalidate_files() drops the entries built on the given documents.
+    """
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry id -> entry, least recently used first
+        self._next_id = 0
+
+    @staticmethod
+    def make_scope(model: str, previous_messages: list[str]) -> str:
+        return hashlib.sha256("\0".join([model, *previous_messages]).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expire(self):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        self.evictions += len(expired)
+
+    def get(self, scope: str, embedding, chunk_ids: list) -> str | None:
+        """Return the cached answer for a query, None on a miss."""
+        if self.ttl <= 0:
+            return None
+        chunk_ids = tuple(chunk_ids)
+        with self._lock:
+            self._expire()
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["scope"] == scope and entry["chunk_ids"] == chunk_ids
+            ]
+            if candidates:
+                vectors = np.stack([entry["vector"] for _, entry in candidates])
+                scores = vectors @ self._normalize(embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def put(self, scope: str, embedding, chunk_ids: list, file_paths: list[str], answer: str):
+        if self.ttl <= 0 or not answer:
+            return
+        with self._lock:
+            self._entries[self._next_id] = {
+                "scope": scope,
+                "vector": self._normalize(embedding),
+                "chunk_ids": tuple(chunk_ids),
+                "file_paths": set(file_paths),
+                "answer": answer,
+                "created": time.monotonic(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_files(self, file_paths):
+        """Drop the entries whose retrieved chunks came from any of 'file_paths'."""
+        file_paths = set(file_paths)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry["file_paths"] & file_paths]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+class RetrievalCache:
+    """
+    Bounded LRU cache of vector store search results.
+
+    Keys combine the collection, its epoch, the query vector quantized to
+    1/'scale' after normalization, top-k, filter and output fields. bump() is
+    called by every write to a collection and moves it to a new epoch, so results
+    computed before the write are never served again.
+    """
+    def __init__(self, max_entries: int, scale: int = 1024):
+        self.max_entries = max_entries
+        self.scale = scale
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._epochs = {}
+
+    def epoch(self, collection_name: str) -> int:
+        with self._lock:
+            return self._epochs.get(collection_name, 0)
+
+    def bump(self, collection_name: str):
+        with self._lock:
+            self._epochs[collection_name] = self._epochs.get(collection_name, 0) + 1
+            stale = [key for key in self._entries if key[0] == collection_name]
+            for key in stale:
+                del self._entries[key]
+
+    def make_key(self, collection_name: str, query_vector, top_k: int, filter: dict | None, output_fields) -> tuple:
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        quantized = np.round(vector * self.scale).astype(np.int16).tobytes()
+        return (
+            collection_name,
+            self.epoch(collection_name),
+            hashlib.sha256(quantized).hexdigest(),
+            top_k,
+            json.dumps(filter, sort_keys=True, default=sorted),
+            tuple(output_fields or ()),
+        )
+
+    @staticmethod
+    def copy_results(results: list[list[dict]]) -> list[list[dict]]:
+        """Copy of search results down to the entities, so callers can't modify the cached ones"""
+        return [
+            [
+                {**hit, "entity": {
+                    field: value.copy() if isinstance(value, np.ndarray) else value
+                    for field, value in hit["entity"].items()
+                }}
+                for hit in hits
+            ]
+            for hits in results
+        ]
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            results = self._entries[key]
+        return self.copy_results(results)
+
+    def put(self, key: tuple, results):
+        results = self.copy_results(results)
+        with self._lock:
+            # A write may have happened while the search was running
+            if key[1] != self._epochs.get(key[0], 0):
+                return
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "epochs": dict(self._epochs),
+            }
+
+conversion_cache = ConversionCache(config.CONVERSION_CACHE_DIR, config.CONVERSION_CACHE_MAX_BYTES)
+thumbnail_cache = ThumbnailCache(config.THUMBNAIL_CACHE_DIR, config.THUMBNAIL_CACHE_MAX_BYTES)
+embedding_cache = EmbeddingCache(config.EMBED_CACHE_PATH, config.EMBED_CACHE_MAX_ENTRIES)
+fetch_cache = FetchCache(config.WEB_CACHE_PATH, config.WEB_CACHE_TTL, config.WEB_CACHE_MAX_BYTES)
+answer_cache = AnswerCache(
+    config.ANSWER_CACHE_MAX_ENTRIES, config.ANSWER_CACHE_TTL, config.ANSWER_CACHE_THRESHOLD
+)
+retrieval_cache = RetrievalCache(config.RETRIEVAL_CACHE_MAX_ENTRIES)
@@ -1,27 +1,138 @@
+import gc
+import sys
+import time
+import threading
+import statistics
+
 from markitdown import MarkItDown
 from marker.converters.pdf import PdfConverter
 from marker.models import create_model_dict
 from marker.config.parser import ConfigParser
 
 from rag_ui.core.config import config
+from rag_ui.data.cache import conversion_cache
+from rag_ui.db.store import TEXT_MAX_BYTES
+
+MARKER_CONFIG = {
+    "output_format": "markdown",
+    "output_dir": "/home/tuquan/rag_ui/src/rag_ui/data/marker-output/"
+}
+
+class MarkerRegistry:
+    """
+    Process-wide, lazily loaded Marker PdfConverter.
+
+    The layout/OCR models are loaded on first use and shared by every later upload.
+    Conversions are limited to 'max_concurrent' at a time, and the models are
+    unloaded after 'idle_timeout' seconds without use (or explicitly with unload()).
+    """
+    def __init__(self, idle_timeout: float | None = None, max_concurrent: int = 1):
+        self.idle_timeout = config.MARKER_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._converter = None
+        self._in_use = 0
+        self._last_used = 0.0
+        self._timer = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._converter is not None
+
+    def _get(self) -> PdfConverter:
+        with self._lock:
+            if self._converter is None:
+                config_parser = ConfigParser(MARKER_CONFIG)
+                self._converter = PdfConverter(
+                    config=config_parser.generate_config_dict(),
+                    artifact_dict=create_model_dict(),
+                )
+            self._in_use += 1
+            return self._converter
+
+    def _release(self):
+        with self._lock:
+            self._in_use -= 1
+            self._last_used = time.monotonic()
+            if self.idle_timeout > 0:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = threading.Timer(self.idle_timeout, self._unload_if_idle)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _unload_if_idle(self):
+        with self._lock:
+            idle = time.monotonic() - self._last_used >= self.idle_timeout
+            if self._in_use == 0 and idle:
+                self._drop()
+
+    def _drop(self):
+        """Release the models. The lock must be held."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._converter is None:
+            return
+        self._converter = None
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def warm(self):
+        """Load the models now instead of on the first conversion."""
+        self._get()
+        self._release()
+
+    def unload(self) -> bool:
+        """Free the models now. Returns False if a conversion is still running."""
+        with self._lock:
+            if self._in_use:
+                return False
+            self._drop()
+            return True
+
+    def convert(self, file_path: str) -> str:
+        """Convert a PDF to markdown with the shared converter."""
+        with self._slots:
+            converter = self._get()
+            try:
+                rendered = converter(file_path)
+            finally:
+                self._release()
+        return rendered.markdown
+
+marker_registry = MarkerRegistry()
+
+def init_convert_worker():
+    """
+    Initializer of the conversion worker processes: load the Marker models once
+    per worker, so each keeps one warm converter for every later conversion.
+    """
+    try:
+        marker_registry.warm()
+    except Exception as e:
+        # Conversions retry the load and report the error themselves
+        print(f"Marker warm-up failed: {e}")
 
 def to_text(file_path: str) -> str:
     """
-    Read the content of a document as string using markitdown.
+    Read the content of a document as string, reusing the cached conversion
+    when the same file was converted before.
+    """
+    converter = "marker-pdf" if file_path.endswith(".pdf") else "markitdown"
+    return conversion_cache.get_or_convert(file_path, converter, convert_document)
+
+def convert_document(file_path: str) -> str:
+    """
+    Read the content of a document as string using marker (PDF) or markitdown.
     """
     if file_path.endswith(".pdf"):
-        config = {
-            "output_format": "markdown",
-            "output_dir": "/home/tuquan/rag_ui/src/rag_ui/data/marker-output/"
-        }
-        config_parser = ConfigParser(config)
-
-        converter = PdfConverter(
-            config=config_parser.generate_config_dict(),
-            artifact_dict=create_model_dict(),
-        )
-        rendered = converter(file_path)
-        return rendered.markdown
+        return marker_registry.convert(file_path)
     
     md = MarkItDown()
     result = md.convert(file_path)
@@ -60,12 +171,46 @@ def to_chunks_words(text: str) -> list[str]:
         chunks.append(".".join(current_chunk))
     return chunks
 
-def to_chunks_paragraphs(text: str) -> list[str]:
+def clip_utf8(text: str, max_bytes: int) -> str:
+    """Longest prefix of 'text' of at most 'max_bytes' UTF-8 bytes"""
+    return text.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")
+
+def split_utf8(text: str, max_bytes: int) -> list[str]:
+    """
+    Pieces of 'text' of at most 'max_bytes' UTF-8 bytes each, cut between lines,
+    or between characters for a line longer than that.
+    """
+    pieces = []
+    current, size = None, 0
+    for line in text.split("\n"):
+        line_size = len(line.encode("utf-8"))
+        if current is not None and size + 1 + line_size <= max_bytes:
+            current, size = f"{current}\n{line}", size + 1 + line_size
+            continue
+        if current is not None:
+            pieces.append(current)
+        while line_size > max_bytes:
+            head = clip_utf8(line, max_bytes)
+            pieces.append(head)
+            line = line[len(head):]
+            line_size = len(line.encode("utf-8"))
+        current, size = line, line_size
+    if current is not None:
+        pieces.append(current)
+    return pieces
+
+def paragraph_chunks(header: str, paragraph: str, max_bytes: int) -> list[str]:
+    """The paragraph under its header, in as many chunks as needed to fit 'max_bytes'"""
+    header = clip_utf8(header, max_bytes // 2)
+    return [f"{header}\n{piece}" for piece in split_utf8(paragraph, max_bytes - len(header.encode("utf-8")) - 1)]
+
+def to_chunks_paragraphs(text: str, max_bytes: int = TEXT_MAX_BYTES) -> list[str]:
     """
     Chunks a markdown string by paragraphs while preserving header context.
     
     Args:
         text: A markdown string
+        max_bytes: Max UTF-8 size of a chunk, longer paragraphs are split
         
     Returns:
         A list of chunks where each chunk contains a header and a paragraph
@@ -80,7 +225,7 @@ def to_chunks_paragraphs(text: str) -> list[str]:
         if line.startswith('#'):
             # If we have a chunk in progress, save it first
             if current_chunk:
-                chunks.append(f"{current_header}\n{current_chunk}")
+                chunks.extend(paragraph_chunks(current_header, current_chunk, max_bytes))
                 current_chunk = ""
             
             # Update the current header
@@ -88,7 +233,7 @@ def to_chunks_paragraphs(text: str) -> list[str]:
         elif line.strip() == '':
             # Empty line indicates a paragraph break
             if current_chunk:
-                chunks.append(f"{current_header}\n{current_chunk}")
+                chunks.extend(paragraph_chunks(current_header, current_chunk, max_bytes))
                 current_chunk = ""
         else:
             # If we're starting a new paragraph and don't have a header yet, use empty header
@@ -103,6 +248,35 @@ def to_chunks_paragraphs(text: str) -> list[str]:
     
     # Don't forget to add the last chunk if there is one
     if current_chunk:
-        chunks.append(f"{current_header}\n{current_chunk}")
+        chunks.extend(paragraph_chunks(current_header, current_chunk, max_bytes))
     
     return chunks
+
+def benchmark_pdf_conversion(pdf_paths: list[str], limit: int = 20):
+    """
+    Report per-document conversion latency with a cold converter
+    (models reloaded for every PDF, as before the registry) versus a warm one.
+    """
+    pdf_paths = pdf_paths[:limit]
+    registry = MarkerRegistry(idle_timeout=0)
+
+    def run(label, cold):
+        latencies = []
+        for path in pdf_paths:
+            if cold:
+                registry.unload()
+            start = time.perf_counter()
+            registry.convert(path)
+            latencies.append(time.perf_counter() - start)
+        print(f"{label}: {len(latencies)} docs, "
+              f"mean {statistics.mean(latencies):.2f}s, "
+              f"median {statistics.median(latencies):.2f}s, "
+              f"max {max(latencies):.2f}s per document")
+
+    run("cold", cold=True)
+    run("warm", cold=False)
+    registry.unload()
+
+if __name__ == "__main__":
+    # python src/rag_ui/data/preprocessing.py doc1.pdf doc2.pdf ...
+    benchmark_pdf_conversion(sys.argv[1:])
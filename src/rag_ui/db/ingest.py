@@ -0,0 +1,367 @@
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from rag_ui.core.config import config
+from rag_ui.data.preprocessing import to_text, to_chunks_paragraphs, init_convert_worker
+from rag_ui.data.cache import file_digest, answer_cache, retrieval_cache
+from rag_ui.db.manifest import ingest_manifest, chunk_hash
+from rag_ui.db.lexical import get_lexical_index
+from rag_ui.db.store import FILE_PATH_MAX_BYTES
+from rag_ui.inference.embed import embed_api
+
+# Marks the end of a stage's output
+_DONE = object()
+
+_convert_pool = None
+_convert_pool_lock = threading.Lock()
+
+def get_convert_pool() -> ProcessPoolExecutor:
+    """
+    Process pool for document conversion, kept alive between uploads.
+
+    Workers are spawned, not forked, so none inherits a copy of the parent's
+    registry, cache index or locks, and each loads its Marker models once when
+    it starts (see init_convert_worker). Every worker holds a full set of models,
+    so memory grows with INGEST_CONVERT_WORKERS.
+    """
+    global _convert_pool
+    with _convert_pool_lock:
+        if _convert_pool is None:
+            _convert_pool = ProcessPoolExecutor(
+                max_workers=config.INGEST_CONVERT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_convert_worker,
+            )
+        return _convert_pool
+
+def reset_convert_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool (a worker died, e.g. out of memory), the next upload starts a new one."""
+    global _convert_pool
+    with _convert_pool_lock:
+        if _convert_pool is pool:
+            _convert_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+class StageStats:
+    """Items processed and busy time of one pipeline stage."""
+    def __init__(self):
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def as_dict(self, wall: float) -> dict:
+        return {
+            "items": self.items,
+            "busy_s": round(self.busy, 3),
+            "items_per_s": round(self.items / wall, 2) if wall > 0 else 0.0,
+        }
+
+class IngestionPipeline:
+    """
+    Staged document ingestion:
+        convert (process pool) -> chunk -> embed (thread pool, batched) -> write (single bulk writer)
+
+    Stages are connected by bounded queues, so a slow stage applies backpressure
+    to the ones before it instead of buffering every document in memory.
+
+    Ingestion is incremental: files whose content hash matches the manifest are
+    skipped, and for changed files only chunks with new hashes are embedded and
+    inserted while chunks that disappeared are deleted.
+    """
+    def __init__(
+            self,
+            store,
+            collection_name: str,
+            embed_workers: int = config.EMBED_MAX_IN_FLIGHT,
+            embed_batch_size: int = config.EMBED_BATCH_SIZE,
+            insert_batch_size: int = 256,
+            queue_size: int = 8,
+            manifest=ingest_manifest,
+        ):
+        self.store = store
+        self.collection_name = collection_name
+        self.embed_workers = embed_workers
+        self.embed_batch_size = embed_batch_size
+        self.insert_batch_size = insert_batch_size
+        self.queue_size = queue_size
+        self.manifest = manifest
+        self.errors = []
+        self.inserted = 0
+        self.removed = 0
+        self.skipped = 0
+        self.stats = {}
+        self._plans = {}  # file_path -> (file_hash, old chunk hashes, new chunk hashes)
+        self._inserted = {}  # file_path -> chunk hashes inserted during this run
+        self.lexical_index = get_lexical_index(collection_name)
+
+    def _record_error(self, stage: str, error: Exception):
+        print(f"Ingestion {stage} error: {error}")
+        self.errors.append(f"{stage}: {error}")
+
+    def _convert(self, documents, out_queue, stats):
+        """Send documents without text to the process pool, at most queue_size in flight."""
+        try:
+            self._submit_conversions(documents, out_queue, stats)
+        except Exception as e:
+            self._record_error("convert", e)
+        finally:
+            out_queue.put(_DONE)
+
+    def _submit_conversions(self, documents, out_queue, stats):
+        pool = get_convert_pool()
+        pending = []
+        for doc in documents:
+            file_path = doc["file_path"]
+            try:
+                if doc.get("text") is not None:
+                    file_hash = chunk_hash(doc["text"])
+                else:
+                    file_hash = file_digest(file_path)
+                entry = self.manifest.get(self.collection_name, file_path)
+            except Exception as e:
+                self._record_error("convert", e)
+                continue
+            if entry is not None and entry[0] == file_hash:
+                self.skipped += 1
+                continue
+            if doc.get("text") is not None:
+                out_queue.put((file_path, file_hash, doc["text"]))
+                continue
+            if len(pending) >= self.queue_size:
+                self._forward_conversion(pending.pop(0), out_queue, stats)
+            try:
+                future = pool.submit(to_text, file_path)
+            except BrokenProcessPool as e:
+                # The pending conversions of the broken pool fail on their own
+                self._record_error("convert", e)
+                reset_convert_pool(pool)
+                pool = get_convert_pool()
+                future = pool.submit(to_text, file_path)
+            pending.append((file_path, file_hash, pool, future, time.perf_counter()))
+            # Forward finished conversions early so the chunker is never starved
+            while pending and pending[0][3].done():
+                self._forward_conversion(pending.pop(0), out_queue, stats)
+        while pending:
+            self._forward_conversion(pending.pop(0), out_queue, stats)
+
+    def _forward_conversion(self, item, out_queue, stats):
+        file_path, file_hash, pool, future, submitted = item
+        try:
+            text = future.result()
+        except BrokenProcessPool as e:
+            self._record_error("convert", f"{file_path}: conversion worker died ({e})")
+            reset_convert_pool(pool)
+            return
+        except Exception as e:
+            self._record_error("convert", e)
+            return
+        stats.add(1, time.perf_counter() - submitted)
+        out_queue.put((file_path, file_hash, text))
+
+    def _chunk(self, in_queue, out_queue, stats):
+        try:
+            self._chunk_documents(in_queue, out_queue, stats)
+        except Exception as e:
+            self._record_error("chunk", e)
+            # The converter must still be able to put its documents
+            while in_queue.get() is not _DONE:
+                pass
+        finally:
+            for _ in range(self.embed_workers):
+                out_queue.put(_DONE)
+
+    def _chunk_documents(self, in_queue, out_queue, stats):
+        # Every item is taken off in_queue even after errors, so the converter never blocks
+        batch = []
+        while (item := in_queue.get()) is not _DONE:
+            file_path, file_hash, text = item
+            start = time.perf_counter()
+            if len(file_path.encode("utf-8")) > FILE_PATH_MAX_BYTES:
+                # Rows are found, and deleted, by their exact path, which cannot be shortened
+                self._record_error("chunk", f"{file_path}: path longer than {FILE_PATH_MAX_BYTES} bytes")
+                continue
+            try:
+                # Identical chunks within a file are stored once
+                chunks = {chunk_hash(chunk): chunk for chunk in to_chunks_paragraphs(text)}
+                entry = self.manifest.get(self.collection_name, file_path)
+            except Exception as e:
+                self._record_error("chunk", e)
+                continue
+            old_hashes = entry[1] if entry is not None else set()
+            self._plans[file_path] = (file_hash, old_hashes, set(chunks))
+            new_chunks = [(h, chunk) for h, chunk in chunks.items() if h not in old_hashes]
+            stats.add(len(new_chunks), time.perf_counter() - start)
+            for h, chunk in new_chunks:
+                batch.append((chunk, file_path, h))
+                if len(batch) >= self.embed_batch_size:
+                    out_queue.put(batch)
+                    batch = []
+        if batch:
+            out_queue.put(batch)
+
+    def _embed(self, in_queue, out_queue, stats):
+        try:
+            while (batch := in_queue.get()) is not _DONE:
+                start = time.perf_counter()
+                try:
+                    embeddings = embed_api([chunk for chunk, _, _ in batch])
+                    rows = [
+                        {"vector": embedding, "text": chunk, "file_path": file_path, "chunk_hash": h}
+                        for (chunk, file_path, h), embedding in zip(batch, embeddings, strict=True)
+                    ]
+                except Exception as e:
+                    self._record_error("embed", e)
+                    continue
+                stats.add(len(batch), time.perf_counter() - start)
+                out_queue.put(rows)
+        finally:
+            out_queue.put(_DONE)
+
+    def _flush(self, rows, stats):
+        start = time.perf_counter()
+        try:
+            insert_count = self.store.insert(self.collection_name, rows)
+        except Exception as e:
+            self._record_error("write", e)
+            return
+        self.inserted += insert_count
+        # Searches must not keep serving results from before these rows
+        retrieval_cache.bump(self.collection_name)
+        stats.add(len(rows), time.perf_counter() - start)
+        for row in rows:
+            self._inserted.setdefault(row["file_path"], set()).add(row["chunk_hash"])
+        try:
+            self.lexical_index.add(rows)
+        except Exception as e:
+            self._record_error("lexical", e)
+
+    def _write(self, in_queue, stats):
+        # Drains in_queue until every embed worker is done, whatever fails,
+        # so none of them blocks on a full queue
+        rows = []
+        finished = 0
+        while finished < self.embed_workers:
+            item = in_queue.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            rows.extend(item)
+            if len(rows) >= self.insert_batch_size:
+                self._safe_flush(rows, stats)
+                rows = []
+        if rows:
+            self._safe_flush(rows, stats)
+
+    def _safe_flush(self, rows, stats):
+        try:
+            self._flush(rows, stats)
+        except Exception as e:
+            self._record_error("write", e)
+
+    def _delete(self, file_path: str, chunk_hashes: list[str] | None = None) -> bool:
+        try:
+            self.store.delete(self.collection_name, file_path, chunk_hashes)
+            retrieval_cache.bump(self.collection_name)
+            return True
+        except Exception as e:
+            self._record_error("delete", e)
+            return False
+
+    def _drop_untracked(self, documents) -> list[str]:
+        """Files without a manifest may have rows from before chunk hashing, replace them."""
+        dropped = []
+        for doc in documents:
+            try:
+                entry = self.manifest.get(self.collection_name, doc["file_path"])
+            except Exception as e:
+                self._record_error("manifest", e)
+                continue
+            if entry is None:
+                if self._delete(doc["file_path"]):
+                    self.lexical_index.remove(doc["file_path"])
+                dropped.append(doc["file_path"])
+        return dropped
+
+    def _finalize(self):
+        """Delete chunks that disappeared and record what is now stored for each file."""
+        for file_path, (file_hash, old_hashes, new_hashes) in self._plans.items():
+            stored = (old_hashes & new_hashes) | self._inserted.get(file_path, set())
+            removed = sorted(old_hashes - new_hashes)
+            if removed:
+                if self._delete(file_path, removed):
+                    self.removed += len(removed)
+                    self.lexical_index.remove(file_path, removed)
+                else:
+                    stored |= set(removed)
+            complete = stored == new_hashes
+            try:
+                self.manifest.put(self.collection_name, file_path, file_hash if complete else None, stored)
+            except Exception as e:
+                self._record_error("manifest", e)
+
+    def run(self, documents: list[dict]) -> dict:
+        """
+        Ingest documents into the collection.
+        Args:
+            documents: [{"file_path": str, "text": str (optional, converted if missing)}]
+        Returns:
+            Per-stage stats: items, busy seconds and items per second of wall time.
+        """
+        self.errors = []
+        self.inserted = 0
+        self.removed = 0
+        self.skipped = 0
+        self._plans = {}
+        self._inserted = {}
+        dropped = self._drop_untracked(documents)
+        stats = {name: StageStats() for name in ("convert", "chunk", "embed", "write")}
+        texts = queue.Queue(maxsize=self.queue_size)
+        chunk_batches = queue.Queue(maxsize=self.queue_size)
+        rows = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._convert, args=(documents, texts, stats["convert"])),
+            threading.Thread(target=self._chunk, args=(texts, chunk_batches, stats["chunk"])),
+            threading.Thread(target=self._write, args=(rows, stats["write"])),
+        ] + [
+            threading.Thread(target=self._embed, args=(chunk_batches, rows, stats["embed"]))
+            for _ in range(self.embed_workers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._finalize()
+        try:
+            self.lexical_index.save()
+        except Exception as e:
+            self._record_error("lexical", e)
+        # Cached answers built on these files may be out of date
+        answer_cache.invalidate_files(set(dropped) | set(self._plans))
+        wall = time.perf_counter() - start
+
+        self.stats = {name: stage.as_dict(wall) for name, stage in stats.items()}
+        self.stats["wall_s"] = round(wall, 3)
+        print(f"Ingestion stats: {self.stats}")
+        return self.stats
+
+def ingest(store, documents: list[dict], collection_name: str) -> str:
+    """Run the ingestion pipeline and return a message for the UI."""
+    pipeline = IngestionPipeline(store, collection_name)
+    pipeline.run(documents)
+    message = f"Total number of chunks inserted: {pipeline.inserted}, removed: {pipeline.removed}"
+    if pipeline.skipped:
+        message += f", unchanged files skipped: {pipeline.skipped}"
+    if pipeline.errors:
+        message += f" ({len(pipeline.errors)} errors: {'; '.join(pipeline.errors)})"
+    return message
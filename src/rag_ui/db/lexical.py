@@ -0,0 +1,371 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from array import array
+
+import numpy as np
+
+from rag_ui.core.config import config
+
+TOKEN_RE = re.compile(r"\w+(?:[-_./]\w+)*")
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased word tokens, unicode aware so Vietnamese words keep their diacritics.
+    Compound identifiers such as 'SKU-4821' are indexed whole and by their parts.
+    """
+    tokens = []
+    for match in TOKEN_RE.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", match) if part)
+    return tokens
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the chunks of one collection.
+
+    Postings are typed arrays (doc ids as uint32, term frequencies as uint16) that
+    grow as chunks are added and are scored with NumPy without copying. Removed
+    chunks are tombstoned and compacted away once they make up a quarter of
+    the index.
+
+    The index is kept in a SQLite table with one row per chunk (its terms and
+    their frequencies), rebuilt into postings when loaded. save() only writes
+    the chunks added or removed since the last save, so its cost follows the
+    size of an upload rather than of the corpus. The chunk text is not stored,
+    hits are looked up in the vector store.
+
+    Chunks are identified like in the vector store by (file_path, chunk_hash).
+    """
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = None
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._postings = {}  # term -> (doc ids, term frequencies)
+        self._docs = []  # doc id -> (file_path, chunk_hash) or None when removed
+        self._lengths = array("I")
+        self._removed = array("B")  # doc id -> 1 when removed
+        self._by_key = {}  # (file_path, chunk_hash) -> doc id
+        self._alive = 0
+        self._total_length = 0
+        self._added = {}  # (file_path, chunk_hash) -> (length, terms, frequencies) not saved yet
+        self._deleted = set()  # keys removed since the last save
+
+    @property
+    def _db_path(self) -> str:
+        return os.path.join(self.index_dir, "lexical.sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chunks (file_path TEXT NOT NULL, chunk_hash TEXT NOT NULL, "
+                    "length INTEGER NOT NULL, terms TEXT NOT NULL, tfs BLOB NOT NULL, "
+                    "PRIMARY KEY (file_path, chunk_hash))"
+                )
+        return self._conn
+
+    def _load(self):
+        if not os.path.exists(self._db_path):
+            self._import_legacy()
+            return
+        rows = self._connect().execute("SELECT file_path, chunk_hash, length, terms, tfs FROM chunks ORDER BY rowid")
+        for file_path, h, length, terms, tfs in rows:
+            self._index((file_path, h), length, terms.split(" ") if terms else [], array("H", tfs))
+
+    def _import_legacy(self):
+        """Index saved by earlier versions: postings.npz and the chunk texts in docs.json"""
+        docs_path = os.path.join(self.index_dir, "docs.json")
+        if not os.path.exists(docs_path):
+            return
+        with open(docs_path, encoding="utf-8") as f:
+            docs = [doc for doc in json.load(f) if doc is not None]
+        self._add([{"file_path": d[0], "chunk_hash": d[1], "text": d[2]} for d in docs])
+        self.save()
+        for name in ("docs.json", "postings.npz"):
+            os.remove(os.path.join(self.index_dir, name))
+
+    def save(self):
+        """Write the chunks added and removed since the last save."""
+        with self._lock:
+            added, deleted = self._added, self._deleted
+            self._added, self._deleted = {}, set()
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "DELETE FROM chunks WHERE file_path = ? AND chunk_hash = ?", list(deleted)
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO chunks (file_path, chunk_hash, length, terms, tfs) VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (key[0], key[1], length, " ".join(terms), tfs.tobytes())
+                            for key, (length, terms, tfs) in added.items()
+                        ]
+                    )
+            except BaseException:
+                # Written with the next save
+                self._added = {**added, **self._added}
+                self._deleted = deleted | self._deleted
+                raise
+
+    def add(self, rows: list[dict]):
+        """Index chunks, rows being {"file_path", "chunk_hash", "text"} as written to the vector store."""
+        with self._lock:
+            self._add(rows)
+
+    def _add(self, rows: list[dict]):
+        for row in rows:
+            key = (row["file_path"], row["chunk_hash"])
+            if key in self._by_key:
+                continue
+            tokens = tokenize(row["text"])
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            terms = list(counts)
+            tfs = array("H", (min(count, 65535) for count in counts.values()))
+            self._index(key, len(tokens), terms, tfs)
+            self._added[key] = (len(tokens), terms, tfs)
+            self._deleted.discard(key)
+
+    def _index(self, key: tuple, length: int, terms: list[str], tfs: array):
+        doc_id = len(self._docs)
+        for term, tf in zip(terms, tfs):
+            if term not in self._postings:
+                self._postings[term] = (array("I"), array("H"))
+            ids, freqs = self._postings[term]
+            ids.append(doc_id)
+            freqs.append(tf)
+        self._docs.append(key)
+        self._lengths.append(length)
+        self._removed.append(0)
+        self._by_key[key] = doc_id
+        self._alive += 1
+        self._total_length += length
+
+    def remove(self, file_path: str, chunk_hashes=None):
+        """Remove the given chunks of a file, all of them when 'chunk_hashes' is None."""
+        with self._lock:
+            if chunk_hashes is None:
+                keys = [key for key in self._by_key if key[0] == file_path]
+            else:
+                keys = [(file_path, h) for h in chunk_hashes]
+            for key in keys:
+                doc_id = self._by_key.pop(key, None)
+                if doc_id is None:
+                    continue
+                self._docs[doc_id] = None
+                self._removed[doc_id] = 1
+                self._alive -= 1
+                self._total_length -= self._lengths[doc_id]
+                self._added.pop(key, None)
+                self._deleted.add(key)
+            if len(self._docs) > 64 and self._alive < 0.75 * len(self._docs):
+                self._compact()
+
+    def _compact(self):
+        """Drop the removed chunks from the postings and renumber the others."""
+        removed = np.frombuffer(self._removed, dtype=np.bool_)
+        new_ids = np.cumsum(~removed, dtype=np.int64) - 1
+        for term in list(self._postings):
+            ids, freqs = self._postings[term]
+            ids = np.frombuffer(ids, dtype=np.uint32)
+            keep = ~removed[ids]
+            if not keep.any():
+                del self._postings[term]
+                continue
+            self._postings[term] = (
+                array("I", new_ids[ids[keep]].astype(np.uint32).tobytes()),
+                array("H", np.frombuffer(freqs, dtype=np.uint16)[keep].tobytes()),
+            )
+        self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[~removed].tobytes())
+        self._docs = [doc for doc in self._docs if doc is not None]
+        self._removed = array("B", bytes(len(self._docs)))
+        self._by_key = {key: doc_id for doc_id, key in enumerate(self._docs)}
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            with self._connect() as conn:
+                conn.execute("DELETE FROM chunks")
+
+    def __len__(self) -> int:
+        return self._alive
+
+    def search(self, query: str, top_k: int = 10) -> list[dict]:
+        """
+        BM25 search.
+        Returns:
+            [{"file_path", "chunk_hash", "score"}], best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._alive or not terms:
+                return []
+            n_docs = len(self._docs)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            avg_length = self._total_length / self._alive
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for term in terms:
+                if term not in self._postings:
+                    continue
+                ids, freqs = self._postings[term]
+                ids = np.frombuffer(ids, dtype=np.uint32)
+                tf = np.frombuffer(freqs, dtype=np.uint16).astype(np.float32)
+                # Tombstoned chunks still count towards document frequencies until compaction,
+                # capped so a term in every chunk does not get a negative weight
+                df = min(len(ids), self._alive)
+                idf = np.log(1 + (self._alive - df + 0.5) / (df + 0.5))
+                scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm[ids])
+            scores[np.frombuffer(self._removed, dtype=np.bool_)] = 0
+            top_k = min(top_k, int(np.count_nonzero(scores)))
+            if top_k == 0:
+                return []
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                {"file_path": self._docs[i][0], "chunk_hash": self._docs[i][1], "score": float(scores[i])}
+                for i in best
+            ]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_lexical_index(collection_name: str) -> LexicalIndex:
+    """The lexical index of a collection, loaded from LEXICAL_INDEX_DIR on first use."""
+    with _indexes_lock:
+        if collection_name not in _indexes:
+            _indexes[collection_name] = LexicalIndex(os.path.join(config.LEXICAL_INDEX_DIR, collection_name))
+        return _indexes[collection_name]
+
+def rrf_scores(rankings: list[list], k: int = 60) -> dict:
+    """Score each key by sum(1 / (k + rank)) over the ranked lists it is in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return scores
+
+def reciprocal_rank_fusion(rankings: list[list], k: int = 60) -> list:
+    """
+    Fuse ranked lists of keys with reciprocal rank scores.
+    Returns:
+        The keys, best first
+    """
+    scores = rrf_scores(rankings, k)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def score_fusion(similarities: dict, bm25_scores: dict, alpha: float = 0.5) -> dict:
+    """
+    Fuse the cosine similarity and the BM25 score of each candidate:
+        alpha * similarity + (1 - alpha) * bm25 / best bm25
+    Unlike reciprocal ranks, a chunk BM25 scores far above the others (an exact
+    product code) keeps that margin, instead of tying with the top vector hit and
+    losing to chunks that both lists rank lower.
+    Args:
+        similarities: {key: cosine similarity to the query} of every candidate
+        bm25_scores: {key: BM25 score}, candidates missing from it score 0
+    """
+    best = max(bm25_scores.values(), default=0.0) or 1.0
+    return {
+        key: alpha * float(similarity) + (1 - alpha) * bm25_scores.get(key, 0.0) / best
+        for key, similarity in similarities.items()
+    }
+
+def benchmark_hybrid(n_docs: int = 20000, n_queries: int = 200, dim: int = 128, top_k: int = 3, seed: int = 0):
+    """
+    Recall@top_k and latency of vector-only, BM25-only, reciprocal rank fusion and
+    score fusion (used by search_context) on a synthetic corpus where each chunk
+    mentions one product code. The synthetic
+    embeddings only see the topic words, like a dense model that cannot tell
+    product codes apart, and queries ask for a code and a topic.
+    """
+    import tempfile
+
+    rng = np.random.default_rng(seed)
+    topics = [f"topic{i}" for i in range(200)]
+    fillers = ["giá", "sản", "phẩm", "bảo", "hành", "price", "warranty", "delivery", "the", "of"]
+    topic_vectors = rng.normal(size=(len(topics), dim)).astype(np.float32)
+
+    codes = [f"SKU-{i:05d}" for i in range(n_docs)]
+    doc_topics = rng.integers(0, len(topics), size=(n_docs, 3))
+    texts = [
+        " ".join([codes[i]] + [topics[t] for t in doc_topics[i]] + list(rng.choice(fillers, 8)))
+        for i in range(n_docs)
+    ]
+    vectors = topic_vectors[doc_topics].sum(axis=1) + 0.1 * rng.normal(size=(n_docs, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = LexicalIndex(index_dir)
+        start = time.perf_counter()
+        index.add([{"file_path": "synthetic", "chunk_hash": str(i), "text": text} for i, text in enumerate(texts)])
+        print(f"indexed {n_docs} chunks in {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        index.save()
+        size = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir))
+        print(f"saved in {time.perf_counter() - start:.2f}s, {size / 1e6:.1f} MB on disk")
+        start = time.perf_counter()
+        index.add([{"file_path": "upload", "chunk_hash": f"upload-{i}", "text": texts[i]} for i in range(100)])
+        index.save()
+        print(f"added and saved 100 more chunks in {(time.perf_counter() - start) * 1e3:.1f} ms")
+        index.remove("upload")
+        index.save()
+
+        targets = rng.choice(n_docs, size=n_queries, replace=False)
+        hits = {"vector": 0, "bm25": 0, "rrf": 0, "score": 0}
+        latency = {"vector": 0.0, "bm25": 0.0, "rrf": 0.0, "score": 0.0}
+        for target in targets:
+            topic = doc_topics[target][0]
+            query = f"giá của {codes[target]} {topics[topic]}"
+            query_vector = topic_vectors[topic] / np.linalg.norm(topic_vectors[topic])
+
+            start = time.perf_counter()
+            vector_ranking = [str(i) for i in np.argsort(-(vectors @ query_vector))[:top_k * 4]]
+            vector_time = time.perf_counter() - start
+            start = time.perf_counter()
+            bm25_hits = index.search(query, top_k * 4)
+            bm25_ranking = [hit["chunk_hash"] for hit in bm25_hits]
+            bm25_time = time.perf_counter() - start
+            start = time.perf_counter()
+            fused = reciprocal_rank_fusion([vector_ranking, bm25_ranking])
+            fuse_time = time.perf_counter() - start
+            start = time.perf_counter()
+            # As in search_context, the vectors of BM25-only hits are looked up to score them
+            candidates = list(dict.fromkeys(vector_ranking + bm25_ranking))
+            similarities = dict(zip(candidates, vectors[[int(key) for key in candidates]] @ query_vector))
+            scores = score_fusion(similarities, {hit["chunk_hash"]: hit["score"] for hit in bm25_hits})
+            score_ranking = sorted(scores, key=scores.get, reverse=True)
+            score_time = time.perf_counter() - start
+
+            rankings = (("vector", vector_ranking), ("bm25", bm25_ranking), ("rrf", fused), ("score", score_ranking))
+            for name, ranking in rankings:
+                hits[name] += str(target) in ranking[:top_k]
+            latency["vector"] += vector_time
+            latency["bm25"] += bm25_time
+            latency["rrf"] += vector_time + bm25_time + fuse_time
+            latency["score"] += vector_time + bm25_time + score_time
+
+        for name in hits:
+            print(
+                f"{name}: recall@{top_k} {hits[name] / n_queries:.3f}, "
+                f"mean latency {latency[name] / n_queries * 1e3:.2f} ms"
+            )
+
+if __name__ == "__main__":
+    benchmark_hybrid()
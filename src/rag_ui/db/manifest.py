@@ -0,0 +1,75 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+
+from rag_ui.core.config import config
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def milvus_str(value: str) -> str:
+    """Quote a string literal for a Milvus filter expression."""
+    return json.dumps(value, ensure_ascii=False)
+
+class IngestManifest:
+    """
+    Per-file record of what is stored in a collection: the hash of the ingested
+    file content and the hashes of its chunks.
+
+    'file_hash' is only set when the stored chunks match the file exactly, so an
+    interrupted ingestion is retried on the next upload instead of being skipped.
+    """
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS manifests ("
+                "collection TEXT NOT NULL, file_path TEXT NOT NULL, file_hash TEXT, "
+                "chunk_hashes TEXT NOT NULL, PRIMARY KEY (collection, file_path))"
+            )
+
+    def get(self, collection_name: str, file_path: str) -> tuple[str | None, set[str]] | None:
+        """Return (file_hash, chunk_hashes) for a file, None if it was never ingested."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hash, chunk_hashes FROM manifests WHERE collection = ? AND file_path = ?",
+                (collection_name, file_path)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], set(json.loads(row[1]))
+
+    def put(self, collection_name: str, file_path: str, file_hash: str | None, chunk_hashes: set[str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifests (collection, file_path, file_hash, chunk_hashes) "
+                "VALUES (?, ?, ?, ?)",
+                (collection_name, file_path, file_hash, json.dumps(sorted(chunk_hashes)))
+            )
+
+    def files(self, collection_name: str) -> list[str]:
+        """Paths of the files ingested into a collection"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path FROM manifests WHERE collection = ?", (collection_name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def remove(self, collection_name: str, file_path: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM manifests WHERE collection = ? AND file_path = ?",
+                (collection_name, file_path)
+            )
+
+    def clear(self, collection_name: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM manifests WHERE collection = ?", (collection_name,))
+
+ingest_manifest = IngestManifest(config.INGEST_MANIFEST_PATH)
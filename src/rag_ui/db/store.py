@@ -0,0 +1,583 @@
+import os
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+from rag_ui.core.config import config
+from rag_ui.db.manifest import milvus_str
+
+# Scalar fields stored next to each vector
+FIELDS = ("text", "file_path", "chunk_hash")
+
+# Max length of the Milvus VARCHAR fields, in UTF-8 bytes
+TEXT_MAX_BYTES = 65535
+FILE_PATH_MAX_BYTES = 1024
+
+# Default build params of each Milvus index type, see MILVUS_INDEX_PARAMS
+INDEX_PARAMS = {
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "IVF_FLAT": {"nlist": 1024},
+    "IVF_SQ8": {"nlist": 1024},
+    "IVF_PQ": {"nlist": 1024, "m": 16, "nbits": 8},
+    "FLAT": {},
+    "AUTOINDEX": {},
+}
+
+def filter_expression(filter: dict | None) -> str:
+    """
+    Milvus boolean expression of a filter.
+    Args:
+        filter: {field: value} for equality, {field: [values]} for membership
+    """
+    if not filter:
+        return ""
+    terms = []
+    for field, value in sorted(filter.items()):
+        if isinstance(value, (list, tuple, set)):
+            terms.append(f"{field} in [{', '.join(milvus_str(v) for v in sorted(value))}]")
+        else:
+            terms.append(f"{field} == {milvus_str(value)}")
+    return " and ".join(terms)
+
+class VectorStore:
+    """
+    Interface of the vector store backends.
+
+    Rows are dicts with a "vector" and the scalar FIELDS, ids are assigned by the
+    store. Filters are {field: value} for equality or {field: [values]} for
+    membership on the scalar fields. Search results follow the Milvus layout:
+        [[{"id", "distance", "entity": {output fields}}]], one list of hits per query
+    with cosine similarity as the distance.
+    """
+    def has_collection(self, collection_name: str) -> bool:
+        raise NotImplementedError
+
+    def create_collection(self, collection_name: str, dim: int):
+        raise NotImplementedError
+
+    def drop_collection(self, collection_name: str):
+        raise NotImplementedError
+
+    def insert(self, collection_name: str, rows: list[dict]) -> int:
+        """Insert rows and return how many were inserted"""
+        raise NotImplementedError
+
+    def delete(self, collection_name: str, file_path: str, chunk_hashes: list[str] | None = None):
+        """Delete the given chunks of a file, all of them when 'chunk_hashes' is None"""
+        raise NotImplementedError
+
+    def search(self, collection_name: str, query_vectors, top_k: int, output_fields: list[str], filter: dict | None = None) -> list[list[dict]]:
+        raise NotImplementedError
+
+    def query(self, collection_name: str, filter: dict, output_fields: list[str]) -> list[dict]:
+        """Rows matching a filter, as {"id", output fields} dicts"""
+        raise NotImplementedError
+
+    def count(self, collection_name: str) -> int:
+        raise NotImplementedError
+
+class MilvusStore(VectorStore):
+    """
+    Milvus (Lite or server) through MilvusClient.
+
+    Collections get an explicit schema (auto id, vector, text, file_path, chunk_hash),
+    an ANN index of 'index_type' on the vector and an INVERTED index on file_path.
+    With 'partition_key', file_path is the partition key: rows of one document
+    share a partition, and a search filtered on file_path only scans the
+    partitions of those documents. Milvus Lite builds FLAT indexes whatever the
+    requested type, the index params then only matter on a Milvus server.
+    """
+    METRIC_TYPE = "COSINE"
+
+    def __init__(
+            self,
+            uri: str,
+            index_type: str = "HNSW",
+            index_params: dict | None = None,
+            ef: int = 64,
+            nprobe: int = 16,
+            partition_key: bool = True,
+            num_partitions: int = 16,
+        ):
+        from pymilvus import MilvusClient
+
+        self.client = MilvusClient(uri)
+        self.index_type = index_type.upper()
+        self.index_params = index_params if index_params is not None else INDEX_PARAMS.get(self.index_type, {})
+        self.ef = ef
+        self.nprobe = nprobe
+        self.partition_key = partition_key
+        self.num_partitions = num_partitions
+
+    def build_schema(self, dim: int):
+        from pymilvus import DataType
+
+        schema = self.client.create_schema(auto_id=True, enable_dynamic_field=True)
+        schema.add_field("id", DataType.INT64, is_primary=True)
+        schema.add_field("vector", DataType.FLOAT_VECTOR, dim=dim)
+        schema.add_field("text", DataType.VARCHAR, max_length=TEXT_MAX_BYTES)
+        schema.add_field("file_path", DataType.VARCHAR, max_length=FILE_PATH_MAX_BYTES, is_partition_key=self.partition_key)
+        schema.add_field("chunk_hash", DataType.VARCHAR, max_length=64)
+        return schema
+
+    def build_index_params(self):
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(
+            field_name="vector",
+            index_type=self.index_type,
+            metric_type=self.METRIC_TYPE,
+            params=self.index_params,
+        )
+        index_params.add_index(field_name="file_path", index_type="INVERTED")
+        return index_params
+
+    def search_params(self, top_k: int) -> dict:
+        """Search-time params matching the index type"""
+        if self.index_type == "HNSW":
+            # ef below top_k would return fewer hits
+            params = {"ef": max(self.ef, top_k)}
+        elif self.index_type.startswith("IVF"):
+            params = {"nprobe": self.nprobe}
+        else:
+            params = {}
+        return {"metric_type": self.METRIC_TYPE, "params": params}
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.client.has_collection(collection_name)
+
+    def create_collection(self, collection_name: str, dim: int):
+        kwargs = {"num_partitions": self.num_partitions} if self.partition_key else {}
+        self.client.create_collection(
+            collection_name=collection_name,
+            schema=self.build_schema(dim),
+            index_params=self.build_index_params(),
+            consistency_level="Strong",
+            **kwargs,
+        )
+
+    def drop_collection(self, collection_name: str):
+        self.client.drop_collection(collection_name)
+
+    def insert(self, collection_name: str, rows: list[dict]) -> int:
+        return self.client.insert(collection_name=collection_name, data=rows)['insert_count']
+
+    def delete(self, collection_name: str, file_path: str, chunk_hashes: list[str] | None = None):
+        filter = {"file_path": file_path}
+        if chunk_hashes is not None:
+            filter["chunk_hash"] = list(chunk_hashes)
+        self.client.delete(collection_name=collection_name, filter=filter_expression(filter))
+
+    def search(self, collection_name: str, query_vectors, top_k: int, output_fields: list[str], filter: dict | str | None = None) -> list[list[dict]]:
+        """
+        Args:
+            filter: A filter dict, or a raw Milvus boolean expression on the scalar fields
+        """
+        return self.client.search(
+            collection_name=collection_name,
+            data=[list(map(float, vector)) for vector in query_vectors],
+            limit=top_k,
+            filter=filter if isinstance(filter, str) else filter_expression(filter),
+            search_params=self.search_params(top_k),
+            output_fields=output_fields,
+        )
+
+    def query(self, collection_name: str, filter: dict, output_fields: list[str]) -> list[dict]:
+        return self.client.query(
+            collection_name=collection_name, filter=filter_expression(filter), output_fields=output_fields
+        )
+
+    def count(self, collection_name: str) -> int:
+        res = self.client.query(collection_name=collection_name, filter="", output_fields=["count(*)"])
+        return res[0]["count(*)"]
+
+class NumpyCollection:
+    """
+    One collection of NumpyStore: a growable memory-mapped float32 matrix of
+    unit vectors ('vectors.f32', row i has id i) and a SQLite table of the
+    scalar fields. Deleted rows keep their vector and are masked out.
+
+    Other processes can open the same directory: inserts reserve their rows in
+    a SQLite write transaction, and a change committed elsewhere is picked up
+    through SQLite's data_version before each operation.
+    """
+    BLOCK = 65536  # Rows scored per matrix product
+
+    def __init__(self, path: str, dim: int | None = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, "rows.sqlite"), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, file_path TEXT NOT NULL, "
+                "chunk_hash TEXT, text TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS rows_file_path ON rows (file_path, chunk_hash)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            if dim is not None:
+                self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (str(dim),))
+                self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('size', '0')")
+        self.dim = int(self._meta("dim"))
+        self._matrix = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._data_version = None
+        self._ivf = None  # (centroids, row lists) when an IVF index is built
+        self._refresh()
+
+    def _meta(self, key: str) -> str:
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    def _map(self, capacity: int):
+        """Map the matrix file, growing it to 'capacity' rows."""
+        if capacity == 0:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            return
+        nbytes = capacity * self.dim * 4
+        mode = "r+" if os.path.exists(self._matrix_path) else "w+"
+        if mode == "r+" and os.path.getsize(self._matrix_path) < nbytes:
+            with open(self._matrix_path, "r+b") as f:
+                f.truncate(nbytes)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+
+    def _refresh(self):
+        (version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        if version == self._data_version:
+            return
+        self._data_version = version
+        # Size and ids from one snapshot, a writer may commit in between
+        self._conn.execute("BEGIN")
+        try:
+            self.size = int(self._meta("size"))
+            ids = np.fromiter((row[0] for row in self._conn.execute("SELECT id FROM rows")), dtype=np.int64)
+        finally:
+            self._conn.commit()
+        capacity = os.path.getsize(self._matrix_path) // (self.dim * 4) if os.path.exists(self._matrix_path) else 0
+        self._map(max(capacity, self.size))
+        self._alive = np.zeros(self.size, dtype=bool)
+        self._alive[ids] = True
+        self._ivf = None
+
+    def insert(self, rows: list[dict]) -> int:
+        """
+        Append rows. The id range is reserved inside a write transaction, so
+        writers in other processes append after each other instead of claiming
+        the same matrix rows.
+        """
+        self._refresh()
+        vectors = np.asarray([row["vector"] for row in rows], dtype=np.float32).reshape(len(rows), self.dim)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = int(self._meta("size"))
+            end = start + len(rows)
+            if end > len(self._matrix):
+                # Double the file so appends are amortized O(1)
+                self._map(max(end, 2 * len(self._matrix), 1024))
+            self._matrix[start:end] = vectors
+            self._matrix.flush()
+            self._conn.executemany(
+                "INSERT INTO rows (id, file_path, chunk_hash, text) VALUES (?, ?, ?, ?)",
+                [(start + i, row["file_path"], row.get("chunk_hash"), row["text"]) for i, row in enumerate(rows)]
+            )
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'size'", (str(end),))
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        if start != self.size:
+            # Another process appended since the last refresh, reload everything
+            self._data_version = None
+            self._refresh()
+            return len(rows)
+        self.size = end
+        self._alive = np.concatenate([self._alive, np.ones(len(rows), dtype=bool)])
+        (self._data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        if self._ivf is not None:
+            self._ivf_assign(np.arange(start, end))
+        return len(rows)
+
+    def _ids(self, filter: dict | None) -> np.ndarray:
+        """Ids of the rows matching a filter"""
+        terms, params = [], []
+        for field, value in sorted((filter or {}).items()):
+            if field not in FIELDS:
+                raise ValueError(f"Unknown field {field}")
+            if isinstance(value, (list, tuple, set)):
+                terms.append(f"{field} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                terms.append(f"{field} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(terms)}" if terms else ""
+        rows = self._conn.execute(f"SELECT id FROM rows{where}", params)
+        return np.fromiter((row[0] for row in rows), dtype=np.int64)
+
+    def delete(self, file_path: str, chunk_hashes: list[str] | None = None):
+        self._refresh()
+        filter = {"file_path": file_path}
+        if chunk_hashes is not None:
+            filter["chunk_hash"] = list(chunk_hashes)
+        ids = self._ids(filter)
+        with self._conn:
+            self._conn.executemany("DELETE FROM rows WHERE id = ?", [(int(i),) for i in ids])
+        self._alive[ids] = False
+        (self._data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+
+    def query(self, filter: dict, output_fields: list[str]) -> list[dict]:
+        self._refresh()
+        ids = self._ids(filter)
+        return [
+            {"id": hit["id"], **hit["entity"]}
+            for hit in self._hits(ids, np.zeros(len(ids), dtype=np.float32), output_fields)
+        ]
+
+    def count(self) -> int:
+        self._refresh()
+        return int(self._alive.sum())
+
+    # ----------------------------------------------------------------------------
+    # IVF: rows are partitioned by their nearest k-means centroid and a search
+    # only scores the rows of the 'nprobe' lists nearest to the query.
+    # ----------------------------------------------------------------------------
+    def build_ivf(self, n_lists: int, iterations: int = 10, sample: int = 100000, seed: int = 0):
+        self._refresh()
+        rng = np.random.default_rng(seed)
+        ids = np.nonzero(self._alive)[0]
+        if len(ids) < n_lists:
+            self._ivf = None
+            return
+        train = np.asarray(self._matrix[np.sort(rng.choice(ids, size=min(sample, len(ids)), replace=False))])
+        centroids = train[rng.choice(len(train), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(train @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = train[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        self._ivf = (centroids, [np.zeros(0, dtype=np.int64) for _ in range(n_lists)])
+        self._ivf_assign(ids)
+
+    def _ivf_assign(self, ids: np.ndarray):
+        centroids, lists = self._ivf
+        assignment = np.empty(len(ids), dtype=np.int64)
+        for start in range(0, len(ids), self.BLOCK):
+            block = ids[start:start + self.BLOCK]
+            assignment[start:start + self.BLOCK] = np.argmax(np.asarray(self._matrix[block]) @ centroids.T, axis=1)
+        for c in np.unique(assignment):
+            lists[c] = np.concatenate([lists[c], ids[assignment == c]])
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows of the 'nprobe' lists nearest to the query"""
+        centroids, lists = self._ivf
+        probes = np.argsort(-(centroids @ query))[:nprobe]
+        return np.sort(np.concatenate([lists[c] for c in probes]))
+
+    def search(self, query_vectors, top_k: int, output_fields: list[str], filter: dict | None = None, nprobe: int = 8) -> list[list[dict]]:
+        self._refresh()
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dim)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        mask = self._alive.copy()
+        scoped = None
+        if filter:
+            scoped = self._ids(filter)
+            allowed = np.zeros(self.size, dtype=bool)
+            allowed[scoped] = True
+            mask &= allowed
+
+        if scoped is not None and (self._ivf is None or len(scoped) < self.BLOCK):
+            # Only score the rows of the filtered documents
+            vectors = np.asarray(self._matrix[scoped])
+            results = []
+            for query in queries:
+                results.append(self._top_k(scoped, vectors @ query, top_k, output_fields))
+            return results
+
+        exact = None
+        if self._ivf is None:
+            # Exact search for all queries at once, block by block so the matrix is
+            # streamed from the page cache once per batch instead of once per query
+            exact = np.empty((len(queries), self.size), dtype=np.float32)
+            for start in range(0, self.size, self.BLOCK):
+                end = min(start + self.BLOCK, self.size)
+                exact[:, start:end] = queries @ self._matrix[start:end].T
+            exact[:, ~mask] = -np.inf
+
+        results = []
+        for q, query in enumerate(queries):
+            if exact is not None:
+                scores = exact[q]
+                ids = np.arange(self.size)
+            else:
+                candidates = self._candidates(query, nprobe)
+                candidates = candidates[mask[candidates]]
+                scores = np.asarray(self._matrix[candidates]) @ query
+                ids = candidates
+            results.append(self._top_k(ids, scores, top_k, output_fields))
+        return results
+
+    def _top_k(self, ids: np.ndarray, scores: np.ndarray, top_k: int, output_fields: list[str]) -> list[dict]:
+        k = min(top_k, int(np.isfinite(scores).sum()))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return self._hits(ids[best], scores[best], output_fields)
+
+    def _hits(self, ids: np.ndarray, scores: np.ndarray, output_fields: list[str]) -> list[dict]:
+        fields = [field for field in output_fields if field in FIELDS]
+        entities = {}
+        if fields:
+            placeholders = ",".join("?" * len(ids))
+            rows = self._conn.execute(
+                f"SELECT id, {', '.join(fields)} FROM rows WHERE id IN ({placeholders})", [int(i) for i in ids]
+            )
+            entities = {row[0]: dict(zip(fields, row[1:])) for row in rows}
+        hits = []
+        for i, score in zip(ids, scores):
+            entity = entities.get(int(i), {})
+            if "vector" in output_fields:
+                entity["vector"] = np.array(self._matrix[i])
+            hits.append({"id": int(i), "distance": float(score), "entity": entity})
+        return hits
+
+class NumpyStore(VectorStore):
+    """
+    In-process vector store, one NumpyCollection directory per collection under 'root_dir'.
+    Search is exact unless 'ivf_lists' > 0, in which case an IVF index is built once a
+    collection has 'ivf_min_rows' rows and 'nprobe' lists are scored per query.
+    """
+    def __init__(self, root_dir: str, ivf_lists: int = 0, nprobe: int = 8, ivf_min_rows: int = 50000):
+        self.root_dir = root_dir
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def _path(self, collection_name: str) -> str:
+        return os.path.join(self.root_dir, collection_name)
+
+    def _collection(self, collection_name: str, dim: int | None = None) -> NumpyCollection:
+        with self._lock:
+            if collection_name not in self._collections:
+                self._collections[collection_name] = NumpyCollection(self._path(collection_name), dim)
+            return self._collections[collection_name]
+
+    def has_collection(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._path(collection_name), "rows.sqlite"))
+
+    def create_collection(self, collection_name: str, dim: int):
+        self._collection(collection_name, dim)
+
+    def drop_collection(self, collection_name: str):
+        with self._lock:
+            self._collections.pop(collection_name, None)
+        for name in ("vectors.f32", "rows.sqlite", "rows.sqlite-wal", "rows.sqlite-shm"):
+            path = os.path.join(self._path(collection_name), name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _maybe_build_ivf(self, collection: NumpyCollection):
+        collection._refresh()
+        if self.ivf_lists and collection._ivf is None and collection.size >= self.ivf_min_rows:
+            collection.build_ivf(self.ivf_lists)
+
+    def insert(self, collection_name: str, rows: list[dict]) -> int:
+        collection = self._collection(collection_name)
+        with self._lock:
+            inserted = collection.insert(rows)
+            self._maybe_build_ivf(collection)
+        return inserted
+
+    def delete(self, collection_name: str, file_path: str, chunk_hashes: list[str] | None = None):
+        collection = self._collection(collection_name)
+        with self._lock:
+            collection.delete(file_path, chunk_hashes)
+
+    def search(self, collection_name: str, query_vectors, top_k: int, output_fields: list[str], filter: dict | None = None) -> list[list[dict]]:
+        collection = self._collection(collection_name)
+        with self._lock:
+            # The IVF index lives in memory, it is rebuilt after a restart or an outside change
+            self._maybe_build_ivf(collection)
+            return collection.search(query_vectors, top_k, output_fields, filter, nprobe=self.nprobe)
+
+    def query(self, collection_name: str, filter: dict, output_fields: list[str]) -> list[dict]:
+        collection = self._collection(collection_name)
+        with self._lock:
+            return collection.query(filter, output_fields)
+
+    def count(self, collection_name: str) -> int:
+        collection = self._collection(collection_name)
+        with self._lock:
+            return collection.count()
+
+def init_vector_store() -> VectorStore:
+    """The vector store selected by VECTOR_BACKEND"""
+    if config.VECTOR_BACKEND == "numpy":
+        return NumpyStore(config.VECTOR_STORE_DIR, ivf_lists=config.VECTOR_IVF_LISTS, nprobe=config.VECTOR_IVF_NPROBE)
+    return MilvusStore(
+        config.MILVUS_URI,
+        index_type=config.MILVUS_INDEX_TYPE,
+        index_params=config.MILVUS_INDEX_PARAMS,
+        ef=config.MILVUS_SEARCH_EF,
+        nprobe=config.MILVUS_SEARCH_NPROBE,
+        partition_key=config.MILVUS_PARTITION_KEY,
+        num_partitions=config.MILVUS_NUM_PARTITIONS,
+    )
+
+def memory_mb() -> float:
+    """Peak resident memory of this process"""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def benchmark_stores(sizes=(10000, 100000, 1000000), dim: int = 384, n_queries: int = 100, batch: int = 10000):
+    """
+    Insert throughput, query latency and memory of each backend on random unit vectors.
+    Milvus is skipped when pymilvus is not installed. Memory is the peak RSS of
+    the process, so compare the growth between rows rather than absolute values.
+    """
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(n_queries, dim)).astype(np.float32)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            stores = {
+                "numpy-exact": NumpyStore(os.path.join(root, "exact")),
+                "numpy-ivf": NumpyStore(os.path.join(root, "ivf"), ivf_lists=int(np.sqrt(size)), ivf_min_rows=size),
+            }
+            try:
+                stores["milvus-lite"] = MilvusStore(os.path.join(root, "milvus.db"))
+            except ImportError:
+                print("pymilvus not installed, skipping Milvus")
+            for name, store in stores.items():
+                store.create_collection("bench", dim)
+                start = time.perf_counter()
+                for offset in range(0, size, batch):
+                    n = min(batch, size - offset)
+                    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+                    store.insert("bench", [
+                        {"vector": vector, "text": "", "file_path": "bench", "chunk_hash": str(offset + i)}
+                        for i, vector in enumerate(vectors)
+                    ])
+                insert_time = time.perf_counter() - start
+                start = time.perf_counter()
+                for query in queries:
+                    store.search("bench", [query], 10, ["file_path"])
+                query_time = (time.perf_counter() - start) / n_queries
+                print(
+                    f"{name} {size} rows: insert {size / insert_time:,.0f} rows/s, "
+                    f"query {query_time * 1e3:.2f} ms, peak RSS {memory_mb():,.0f} MB"
+                )
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark_stores(tuple(int(n) for n in sys.argv[1:]) or (10000, 100000, 1000000))
@@ -1,76 +1,95 @@
-import os
-from multiprocessing import Pool
 
-from pymilvus import MilvusClient
+import numpy as np
 
 from rag_ui.data.preprocessing import to_chunks_paragraphs
 from rag_ui.inference.ollama_client import ollama_embed_response
 from rag_ui.inference.embed import embed_api
 from rag_ui.core.config import config
+from rag_ui.db.ingest import ingest
+from rag_ui.db.manifest import ingest_manifest, chunk_hash
+from rag_ui.db.lexical import get_lexical_index
+from rag_ui.db.store import VectorStore, init_vector_store, FILE_PATH_MAX_BYTES
+from rag_ui.data.cache import answer_cache, retrieval_cache
 
-MILVUS_METRIC_TYPE = "COSINE"
-
-def init_milvus_client():
-    # temporary hard-code endpoint
-    milvus_endpoint = "./src/rag_ui/db/milvus.db"
-
-    client = MilvusClient(milvus_endpoint)
-    return client
-
-def check_collection(client, collection_name: str = None, drop_old: bool = False) -> bool:
+def check_collection(store: VectorStore, collection_name: str = None, drop_old: bool = False) -> bool:
     """Check if the collection existed in the vector database"""
-    if client.has_collection(collection_name) and drop_old:
-        client.drop_collection(collection_name)
-    if client.has_collection(collection_name):
+    if store.has_collection(collection_name) and drop_old:
+        store.drop_collection(collection_name)
+        ingest_manifest.clear(collection_name)
+        answer_cache.clear()
+        retrieval_cache.bump(collection_name)
+        get_lexical_index(collection_name).clear()
+    if store.has_collection(collection_name):
         return True
         raise RuntimeError(
             f"Collection {collection_name} already exists. Set drop_old=True to create a new one instead."
         )
     return False
         
-def create_collection(client, collection_name: str, dim: int):
+def create_collection(store: VectorStore, collection_name: str, dim: int):
     """Create the collection in the vector database if the collection doesn't exist"""
-    has_collection = check_collection(client, collection_name)
+    has_collection = check_collection(store, collection_name)
     if not has_collection:
-        client.create_collection(
-            collection_name=collection_name,
-            dimension=dim,
-            metric_type=MILVUS_METRIC_TYPE,
-            consistency_level="Strong",
-            auto_id=True,
-        )
+        store.create_collection(collection_name, dim)
 
-def get_search_results(client, collection_name: str, query_vector, output_fields):
-    """Get the search result with the output fields list"""
-    search_res = client.search(
-        collection_name=collection_name,
-        data=[query_vector],
-        limit=3,
-        search_params={"metric_type": MILVUS_METRIC_TYPE, "params": {}},  # Inner product distance
-        output_fields=output_fields, # A list of str represents output fields
-    )
+def get_search_results(store: VectorStore, collection_name: str, query_vector, output_fields, top_k: int = 3, filter: dict | None = None):
+    """
+    Get the search result with the output fields list, served from retrieval_cache
+    when the same query was searched since the collection last changed.
+    Args:
+        top_k: Number of hits returned
+        filter: {field: value} or {field: [values]} on the scalar fields, None for none
+    Returns:
+        [[{"id", "distance", "entity"}]], one list of hits for the query
+    """
+    key = retrieval_cache.make_key(collection_name, query_vector, top_k, filter, output_fields)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        return cached
+    search_res = store.search(collection_name, [query_vector], top_k, output_fields, filter)
+    # Plain lists and dicts, so cached results do not hold on to the client's objects
+    search_res = [
+        [{"id": hit["id"], "distance": hit["distance"], "entity": dict(hit["entity"])} for hit in hits]
+        for hits in search_res
+    ]
+    for hits in search_res:
+        for hit in hits:
+            if "vector" in hit["entity"]:
+                # float32 arrays take a fraction of the memory of lists of floats
+                hit["entity"]["vector"] = np.asarray(hit["entity"]["vector"], dtype=np.float32)
+    retrieval_cache.put(key, search_res)
     return search_res
 
-def insert(client, text, file_path, collection_name):
+def insert(store: VectorStore, text, file_path, collection_name):
     """Insert the embeddings gotten from text chunks with the correspond text and file path"""
+    if len(file_path.encode("utf-8")) > FILE_PATH_MAX_BYTES:
+        return f"Error inserting data: path longer than {FILE_PATH_MAX_BYTES} bytes"
     data = []
     chunks = to_chunks_paragraphs(text)
     # embeddings = ollama_embed_response(config.EMBEDDING_MODEL, chunks)
     embeddings = embed_api(chunks)
     for chunk, embedding in zip(chunks, embeddings):
-        data.append({"vector": embedding, "text": chunk, "file_path": file_path})
+        data.append({"vector": embedding, "text": chunk, "file_path": file_path, "chunk_hash": chunk_hash(chunk)})
     try: 
-        mr = client.insert(collection_name=collection_name, data=data)
-        return f"Total number of chunks inserted: {mr['insert_count']}"
+        insert_count = store.insert(collection_name, data)
+        retrieval_cache.bump(collection_name)
+        answer_cache.invalidate_files([file_path])
+        lexical_index = get_lexical_index(collection_name)
+        lexical_index.add(data)
+        lexical_index.save()
+        return f"Total number of chunks inserted: {insert_count}"
     except Exception as e:
         return f"Error inserting data: {e}"
     
-def insert_batch(client, data_list, collection_name):
+def insert_batch(store: VectorStore, data_list, collection_name):
     """
-    Batch insert
+    Batch insert through the staged ingestion pipeline
     Args:
-        data: [{"text": str, "file_path": str}]
+        data: [{"file_path": str, "text": str}], documents without "text" are converted first
     """
-    with Pool(processes=os.cpu_count() - 1) as pool:
-        pool.starmap(insert, [(client, d["text"], d["file_path"], collection_name) for d in data_list])
-    return "Successfully processed files."
+    try:
+        return ingest(store, data_list, collection_name)
+    finally:
+        # The pipeline bumps the epoch after each write, this also covers
+        # searches cached while the last write was running
+        retrieval_cache.bump(collection_name)
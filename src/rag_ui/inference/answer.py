@@ -0,0 +1,279 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rag_ui.core.config import config
+from rag_ui.core.modules.web import get_raw
+from rag_ui.core.modules.product_search import websosanh_search
+from rag_ui.data.cache import answer_cache
+from rag_ui.db.vectorstore import get_search_results
+from rag_ui.db.lexical import get_lexical_index, score_fusion
+from rag_ui.db.manifest import ingest_manifest
+from rag_ui.inference.embed import embed_api
+from rag_ui.inference.intent import IntentRouter
+from rag_ui.inference.rerank import mmr_select, normalize_rows
+from rag_ui.inference.tokens import count_tokens_many
+from rag_ui.inference.prompt import pack_context
+from rag_ui.inference.summarize import summarize_context
+from rag_ui.inference.ollama_client import (
+    ollama_chat_response, ollama_chat_stream, product_keyword, fix_latex_response
+)
+from rag_ui.inference.streaming import token_streams
+from rag_ui.core.jobs import JobManager, JobCancelled
+
+COLLECTION_NAME = "documents"
+OUTPUT_FIELDS = ["text", "file_path", "chunk_hash"]
+
+# Shared by all requests for the speculative vector searches
+answer_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="answer")
+
+# Chat answers are generated off the Dash request threads
+answer_jobs = JobManager(max_workers=config.ANSWER_WORKERS, max_pending=config.ANSWER_QUEUE_SIZE)
+
+intent_router = IntentRouter(embed=embed_api if config.INTENT_CENTROIDS else None)
+
+def timed(timings: dict, stage: str, fn, *args, **kwargs):
+    """Call fn and record its duration in timings[stage]"""
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+def embed_query(query: str) -> list[float]:
+    # return ollama_embed_response(config.EMBEDDING_MODEL, ollama_client, [query])[0]
+    return embed_api([query])[0]
+
+def mentioned_documents(query: str) -> list[str]:
+    """Paths of the ingested documents whose file name, with or without extension, is in the query"""
+    lowered = query.lower()
+    mentioned = []
+    for file_path in ingest_manifest.files(COLLECTION_NAME):
+        name = os.path.basename(file_path).lower()
+        stem = os.path.splitext(name)[0]
+        # Short stems such as "a" or "cv" would match too many messages
+        if name in lowered or (len(stem) >= 4 and stem in lowered):
+            mentioned.append(file_path)
+    return mentioned
+
+def search_context(vector_store, query: str, embedding) -> tuple[list[str], list[tuple]]:
+    """
+    Search the documents collection and format the hits as context chunks.
+
+    RERANK_CANDIDATES chunks are fetched with their vectors and, with HYBRID_SEARCH,
+    joined by the BM25 hits, whose text and vector are read from the vector store;
+    candidates are ranked by score fusion (lexical.score_fusion) of the two. MMR then
+    picks up to RETRIEVAL_TOP_K diverse chunks within CONTEXT_TOKEN_BUDGET. No context
+    is returned when even the best chunk is less similar to the query than
+    RELEVANCE_THRESHOLD. Queries that name uploaded documents only search those documents.
+    Returns:
+        (chunks, sources), sources being the (chunk hash, file path) of each chunk
+    """
+    top_k = config.RETRIEVAL_TOP_K
+    fetch_k = max(config.RERANK_CANDIDATES, top_k)
+    documents = mentioned_documents(query)
+    filter = {"file_path": documents} if documents else None
+    # Search for similar embeddings in the vector store
+    search_res = get_search_results(
+        vector_store, COLLECTION_NAME, embedding, OUTPUT_FIELDS + ["vector"], top_k=fetch_k, filter=filter
+    )
+    texts, vectors = {}, {}
+    for res in search_res[0]:
+        entity = res["entity"]
+        # Rows inserted before chunk hashing have no hash
+        key = (entity["file_path"], entity.get("chunk_hash") or f"id:{res['id']}")
+        texts[key] = entity["text"]
+        vectors[key] = entity["vector"]
+    bm25_scores = {}
+    if config.HYBRID_SEARCH:
+        for hit in get_lexical_index(COLLECTION_NAME).search(query, fetch_k * 4 if documents else fetch_k):
+            if documents and hit["file_path"] not in documents:
+                continue
+            bm25_scores[(hit["file_path"], hit["chunk_hash"])] = hit["score"]
+        missing = [key for key in bm25_scores if key not in vectors]
+        if missing:
+            rows = vector_store.query(
+                COLLECTION_NAME, {"chunk_hash": sorted({h for _, h in missing})}, OUTPUT_FIELDS + ["vector"]
+            )
+            # BM25 hits the store no longer has are left out, they have no vector
+            for row in rows:
+                key = (row["file_path"], row["chunk_hash"])
+                if key in bm25_scores:
+                    texts[key] = row["text"]
+                    vectors[key] = np.asarray(row["vector"], dtype=np.float32)
+    if not vectors:
+        return [], []
+
+    keys = list(vectors)
+    similarities = dict(zip(keys, normalize_rows([vectors[key] for key in keys]) @ normalize_rows(embedding)))
+    if config.HYBRID_SEARCH:
+        scores = score_fusion(similarities, bm25_scores, config.HYBRID_ALPHA)
+    else:
+        scores = similarities
+    candidates = sorted(keys, key=scores.get, reverse=True)[:fetch_k]
+    if max(similarities[key] for key in candidates) < config.RELEVANCE_THRESHOLD:
+        return [], []
+    candidate_vectors = normalize_rows([vectors[key] for key in candidates])
+    relevance = np.array([scores[key] for key in candidates], dtype=np.float32)
+    picked = mmr_select(
+        embedding,
+        candidate_vectors,
+        k=top_k,
+        lambda_=config.MMR_LAMBDA,
+        relevance=relevance,
+        token_counts=count_tokens_many([texts[key] for key in candidates]),
+        token_budget=config.CONTEXT_TOKEN_BUDGET,
+    )
+    retrieved = [candidates[i] for i in picked]
+    chunks = [f"File: {file_path}\nRelevance Text: {texts[(file_path, h)]}" for file_path, h in retrieved]
+    return chunks, [(h, file_path) for file_path, h in retrieved]
+
+def build_context(
+        vector_store, ollama_client, history: list[str], cancel_event=None
+    ) -> tuple[list[str], list[str], dict | None, dict]:
+    """
+    Decide the user's intent and build the context to answer the latest message.
+
+    The intent router settles most messages with rules alone. For ambiguous ones,
+    retrieval is speculative: the vector search runs while the router looks at the
+    query embedding and, if still unsure, asks the LLM; the search result is
+    discarded if the user wants a url summarized. Pages too long for one prompt
+    are summarized section by section first (see summarize.py).
+
+    Returns:
+        (history, context chunks, retrieval, timings), retrieval being {"embedding", "sources"}
+        for document answers and None for url summaries, timings holding the duration
+        of each stage in seconds and the tier that decided the intent
+    """
+    timings = {}
+    start = time.perf_counter()
+    latest_user_message = history[0]
+
+    decision = timed(timings, "intent_rules", intent_router.route_rules, latest_user_message)
+    retrieval = None
+    embedding = None
+    if decision is None or decision["intent"] != "Summarize":
+        embedding = timed(timings, "embed", embed_query, latest_user_message)
+        retrieval = answer_executor.submit(
+            timed, timings, "search", search_context, vector_store, latest_user_message, embedding
+        )
+    if decision is None:
+        decision = timed(
+            timings, "intent", intent_router.route, latest_user_message, ollama_client, embedding
+        )
+    timings["intent_tier"] = decision["tier"]
+
+    if decision["intent"] == "Summarize":
+        if retrieval is not None:
+            retrieval.cancel()
+        context = timed(timings, "fetch", get_raw, decision["url"])
+        # Long pages are reduced to partial summaries first
+        context = [timed(
+            timings, "summarize", summarize_context, ollama_client, context, latest_user_message, timings, cancel_event
+        )]
+        history = [latest_user_message]
+        retrieval = None
+    else:
+        context, sources = retrieval.result()
+        retrieval = {"embedding": embedding, "sources": sources}
+
+    timings["total"] = time.perf_counter() - start
+    if "intent" in timings and decision["intent"] != "Summarize":
+        # Wall-clock time saved by overlapping the search with intent recognition
+        timings["saved"] = min(timings["intent"], timings["search"])
+    print("Context stage timings:", {
+        stage: round(t, 4) if isinstance(t, float) else t for stage, t in timings.items()
+    })
+    return history, context, retrieval, timings
+
+def cache_stream(tokens, store):
+    """Pass the tokens through and call store(answer) once the stream completes"""
+    parts = []
+    for token in tokens:
+        parts.append(token)
+        yield token
+    store(fix_latex_response("".join(parts)))
+
+def generate_answer(
+        cancel_event,
+        vector_store,
+        ollama_client,
+        history: list[str],
+        search: bool,
+        turns: list[dict] | None = None,
+        session_id: str | None = None,
+    ) -> dict:
+    """
+    Answer the latest message, run as a background job (see core/jobs.py).
+
+    When responses are streamed the job returns as soon as the stream is started,
+    the tokens then reach the browser through the SSE route.
+
+    Args:
+        history: [latest user message, previous user messages newest first]
+        turns: Past user and assistant messages of the conversation, oldest first,
+            sent as chat messages so Ollama reuses the prompt cache of the session
+
+    Returns:
+        {"content": str, "json_res": str, "product_keyword": str | None,
+         "stream_id": str | None, "timings": dict}
+    """
+    answer = {"content": "", "json_res": "", "product_keyword": None, "stream_id": None, "timings": {}}
+    try:
+        if search:
+            # The keyword is kept on the message to fetch more products on demand
+            answer["product_keyword"] = product_keyword(
+                model=config.LLM_MODEL,
+                client=ollama_client,
+                user_message=history[0]
+            )
+            if answer["product_keyword"] is not None:
+                answer["json_res"] = websosanh_search(answer["product_keyword"])
+            return answer
+
+        # Intent recognition and speculative retrieval run in parallel
+        history, context, retrieval, answer["timings"] = build_context(
+            vector_store, ollama_client, history, cancel_event
+        )
+        store = lambda text: None
+        if retrieval is not None:
+            # Same question, same retrieved chunks: reuse the previous answer
+            scope = answer_cache.make_scope(config.LLM_MODEL, history[1:])
+            chunk_ids = [chunk_id for chunk_id, _ in retrieval["sources"]]
+            cached = answer_cache.get(scope, retrieval["embedding"], chunk_ids)
+            answer["timings"]["answer_cache"] = "hit" if cached is not None else "miss"
+            if cached is not None:
+                answer["content"] = cached
+                return answer
+            file_paths = [file_path for _, file_path in retrieval["sources"]]
+            store = lambda text: answer_cache.put(scope, retrieval["embedding"], chunk_ids, file_paths, text)
+        history, context, turns, answer["timings"]["tokens"] = pack_context(
+            history, context, config.PROMPT_TOKEN_BUDGET, turns, session_id
+        )
+        # The user may have left the chat while the context was being built
+        if cancel_event.is_set():
+            raise JobCancelled()
+        if config.STREAM_RESPONSES:
+            answer["stream_id"] = token_streams.start(cache_stream(ollama_chat_stream(
+                model=config.LLM_MODEL,
+                client=ollama_client,
+                history=history,
+                context=context,
+                turns=turns,
+            ), store))
+        else:
+            answer["content"] = ollama_chat_response(
+                model=config.LLM_MODEL,
+                client=ollama_client,
+                history=history,
+                context=context,
+                turns=turns,
+            )
+            store(answer["content"])
+    except JobCancelled:
+        raise
+    except Exception as e:
+        answer["content"] = f"Request failed: {str(e)}"
+    return answer
@@ -1,14 +1,88 @@
-import requests
+import time
+import asyncio
+import threading
+
+import httpx
 
 from rag_ui.core.config import config
+from rag_ui.data.cache import embedding_cache
+from rag_ui.inference.gateway import gateway
 
 EMBED_URL = config.EMBED_NGROK_URL + "/embed"
 
-def embed_api(texts: list[str]) -> str:
-    data = {
-        'texts': texts
-    }
-    response = requests.post(EMBED_URL, json=data)
-    response.raise_for_status()
-    response = response.json()['embeddings']
-    return response
\ No newline at end of file
+class EmbeddingClient:
+    """
+    Client for the remote embedding API.
+
+    Inputs are split into batches of 'batch_size' texts which are sent concurrently
+    through the gateway, at most EMBED_MAX_IN_FLIGHT at a time over its pooled
+    connections (so TLS through ngrok is reused). Failed batches are retried with
+    exponential backoff and results are returned in input order.
+    """
+    def __init__(
+            self,
+            url: str = EMBED_URL,
+            batch_size: int = config.EMBED_BATCH_SIZE,
+            retries: int = 3,
+            backoff: float = 0.5,
+        ):
+        self.url = url
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        # One entry per batch of the latest embed() call
+        self.batch_stats = []
+
+    async def _post(self, index: int, texts: list[str]) -> list[list[float]]:
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                embeddings = (await gateway.post_json("embed", self.url, json={'texts': texts}))['embeddings']
+            except (httpx.HTTPError, KeyError, ValueError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                continue
+            with self._lock:
+                self.batch_stats.append({
+                    "batch": index,
+                    "size": len(texts),
+                    "attempts": attempt + 1,
+                    "latency": time.perf_counter() - start,
+                })
+            return embeddings
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with self._lock:
+            self.batch_stats = []
+        # gather() keeps the batches in submission order
+        results = await asyncio.gather(*(self._post(i, batch) for i, batch in enumerate(batches)))
+        return [embedding for batch in results for embedding in batch]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return gateway.run(self.aembed(texts))
+
+embedding_client = EmbeddingClient()
+
+def embed_remote(texts: list[str]) -> list[list[float]]:
+    """Embed texts with the remote embedding API, without caching."""
+    return embedding_client.embed(texts)
+
+def embed_api(texts: list[str]) -> list[list[float]]:
+    """
+    Embed texts, only sending the ones missing from the embedding cache to the API.
+    """
+    model, dim = config.EMBEDDING_MODEL, config.EMBEDDING_DIM
+    embeddings = embedding_cache.get_many(model, dim, texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        # Identical texts in one batch are only embedded once
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        fetched = embed_remote(unique_texts)
+        embedding_cache.put_many(model, dim, unique_texts, fetched)
+        by_text = dict(zip(unique_texts, fetched))
+        for i in missing:
+            embeddings[i] = by_text[texts[i]]
+    return embeddings
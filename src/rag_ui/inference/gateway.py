@@ -0,0 +1,167 @@
+import asyncio
+import threading
+
+import httpx
+from ollama import AsyncClient
+
+from rag_ui.core.config import config
+
+# Requests in flight per upstream, and their timeouts in seconds
+UPSTREAM_LIMITS = {
+    "ollama": 4, "embed": config.EMBED_MAX_IN_FLIGHT, "whisper": 2, "web": 8, "image": 8, "product": 4,
+}
+UPSTREAM_TIMEOUTS = {
+    "ollama": 300, "embed": config.EMBED_TIMEOUT, "whisper": 120, "web": 10, "image": 10,
+    "product": config.PRODUCT_SEARCH_TIMEOUT,
+}
+
+class InferenceGateway:
+    """
+    Asyncio gateway to every upstream the app calls: Ollama, the embedding and
+    Whisper APIs, web pages, product images and websosanh.vn.
+
+    All requests share one ollama.AsyncClient and one httpx.AsyncClient, and each
+    upstream has its own concurrency limit and timeout, so a slow upstream only
+    queues its own requests. The gateway owns an event loop in a background thread.
+
+    Each inference and web function has a public coroutine (aembed, awhisper,
+    aget_raw, asearch/awebsosanh_search, aintent, achat_response, achat_stream,
+    aproduct_keyword) for async callers, and the sync function the Dash callbacks
+    use is a thin wrapper running it here with run() or iterate(). Coroutines must
+    only await other coroutines: a sync wrapper called on the gateway loop would
+    wait for itself.
+    """
+    def __init__(self, limits: dict = UPSTREAM_LIMITS, timeouts: dict = UPSTREAM_TIMEOUTS):
+        self.limits = dict(limits)
+        self.timeouts = dict(timeouts)
+        self._loop = None
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._http = None
+        self._ollama = None
+
+    # ----------------------------------------------------------------------------
+    # Event loop and shared clients
+    # ----------------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="inference-gateway", daemon=True).start()
+            return self._loop
+
+    def run(self, coro, timeout: float | None = None):
+        """Run a gateway coroutine from synchronous code and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    def iterate(self, agen):
+        """Sync generator over an async generator running on the gateway loop."""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Closing the sync generator early releases the upstream too
+            self.run(agen.aclose())
+
+    def _limit(self, upstream: str) -> asyncio.Semaphore:
+        if upstream not in self._semaphores:
+            self._semaphores[upstream] = asyncio.Semaphore(self.limits[upstream])
+        return self._semaphores[upstream]
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=sum(self.limits.values())),
+                follow_redirects=True,
+            )
+        return self._http
+
+    @property
+    def ollama(self) -> AsyncClient:
+        if self._ollama is None:
+            self._ollama = AsyncClient(host=config.OLLAMA_NGROK_URL, timeout=self.timeouts["ollama"])
+        return self._ollama
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # ----------------------------------------------------------------------------
+    # Ollama
+    # ----------------------------------------------------------------------------
+    async def chat(self, model: str, messages: list[dict], **kwargs):
+        async with self._limit("ollama"):
+            return await self.ollama.chat(model=model, messages=messages, **kwargs)
+
+    async def chat_stream(self, model: str, messages: list[dict], **kwargs):
+        """Async generator of the streamed response parts"""
+        async with self._limit("ollama"):
+            async for part in await self.ollama.chat(model=model, messages=messages, stream=True, **kwargs):
+                yield part
+
+    async def ollama_embed(self, model: str, input: list[str], **kwargs):
+        async with self._limit("ollama"):
+            return await self.ollama.embed(model=model, input=input, **kwargs)
+
+    # ----------------------------------------------------------------------------
+    # HTTP upstreams
+    # ----------------------------------------------------------------------------
+    async def post_json(self, upstream: str, url: str, timeout: float | None = None, **kwargs):
+        """POST to 'url' ('json', 'files', 'headers' as in httpx) and parse the JSON response."""
+        async with self._limit(upstream):
+            response = await self.http.post(url, timeout=timeout or self.timeouts[upstream], **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_limited(
+            self,
+            upstream: str,
+            url: str,
+            headers: dict | None = None,
+            max_bytes: int | None = None,
+            timeout: float | None = None,
+        ) -> tuple[int, httpx.Headers, bytes]:
+        """
+        GET 'url', streaming the body and stopping after 'max_bytes'.
+        Returns:
+            (status code, response headers, body), the body being empty for a 304
+        """
+        async with self._limit(upstream):
+            async with self.http.stream(
+                "GET", url, headers=headers, timeout=timeout or self.timeouts[upstream]
+            ) as response:
+                if response.status_code == 304:
+                    return response.status_code, response.headers, b""
+                response.raise_for_status()
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if max_bytes is not None and size >= max_bytes:
+                        break
+        content = b"".join(chunks)
+        return response.status_code, response.headers, content[:max_bytes] if max_bytes is not None else content
+
+class GatewayOllamaClient:
+    """
+    Drop-in replacement of ollama.Client whose calls go through the gateway,
+    for the code written against the sync client.
+    """
+    def __init__(self, gateway: InferenceGateway):
+        self.gateway = gateway
+
+    def chat(self, model: str, messages: list[dict] = None, stream: bool = False, **kwargs):
+        if stream:
+            return self.gateway.iterate(self.gateway.chat_stream(model, messages, **kwargs))
+        return self.gateway.run(self.gateway.chat(model, messages, **kwargs))
+
+    def embed(self, model: str, input: list[str], **kwargs):
+        return self.gateway.run(self.gateway.ollama_embed(model, input, **kwargs))
+
+gateway = InferenceGateway()
+ollama_client = GatewayOllamaClient(gateway)
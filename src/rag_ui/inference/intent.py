@@ -0,0 +1,208 @@
+import re
+import json
+import asyncio
+import time
+import threading
+
+import numpy as np
+
+from rag_ui.core.config import config
+from rag_ui.inference.ollama_client import intent_recognition, aintent
+
+URL_RE = re.compile(r"(https?://[^\s<>\"']+|www\.[^\s<>\"']+)", re.IGNORECASE)
+SUMMARIZE_KEYWORDS = (
+    "summarize", "summarise", "summary", "sum up", "tl;dr", "tldr", "main points", "gist",
+    "tóm tắt", "tom tat", "tóm lược", "tom luoc", "ý chính", "y chinh", "nội dung chính",
+)
+
+# Example messages for the nearest-centroid tier, embedded once on first use
+CENTROID_EXAMPLES = {
+    "Summarize": [
+        "Can you tell me what this article is about {url}",
+        "What does this page say? {url}",
+        "Give me the key takeaways of {url}",
+        "Read {url} and explain it to me",
+        "Bài viết này nói về gì {url}",
+        "Đọc giúp mình trang này {url}",
+    ],
+    "None": [
+        "Is {url} a reliable source for this?",
+        "Why does {url} return an error?",
+        "How do I add a link like {url} to my document?",
+        "Compare the pricing on {url} with the document I uploaded",
+        "Trang {url} có an toàn không?",
+        "Làm sao để truy cập {url}",
+    ],
+}
+
+def find_url(message: str) -> str | None:
+    match = URL_RE.search(message)
+    if match is None:
+        return None
+    url = match.group(0).rstrip(".,;:!?)]}")
+    return url if url.lower().startswith("http") else "https://" + url
+
+def parse_intent(text: str, url: str | None) -> dict:
+    """
+    Parse the LLM's intent answer, tolerating code fences and extra words around the dict.
+    Falls back to looking for the word 'summarize' when no dict can be decoded.
+    """
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            intent = json.loads(match.group(0))
+            if isinstance(intent, dict) and intent.get("Summarize"):
+                return {"intent": "Summarize", "url": intent["Summarize"]}
+            if isinstance(intent, dict):
+                return {"intent": "None", "url": None}
+        except json.JSONDecodeError:
+            pass
+    if url and "summar" in text.lower():
+        return {"intent": "Summarize", "url": url}
+    return {"intent": "None", "url": None}
+
+class IntentRouter:
+    """
+    Tiered intent recognition, cheapest tier first:
+        1. "rules": url detection and keyword rules (microseconds).
+        2. "centroid": nearest centroid over the query embedding, only decides
+           when the similarity margin is at least 'centroid_margin'.
+        3. "llm": intent_recognition, only for messages the other tiers leave ambiguous.
+
+    Every decision is a dict {"intent": "Summarize" | "None", "url": str | None, "tier": str}.
+    """
+    def __init__(self, embed=None, centroid_margin: float = 0.05):
+        # embed: function list[str] -> list[list[float]], None disables the centroid tier
+        self.embed = embed
+        self.centroid_margin = centroid_margin
+        self.tier_counts = {"rules": 0, "centroid": 0, "llm": 0}
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def _count(self, decision: dict) -> dict:
+        with self._lock:
+            self.tier_counts[decision["tier"]] += 1
+        return decision
+
+    def route_rules(self, message: str) -> dict | None:
+        """Decide from the text alone, None if the message is ambiguous."""
+        url = find_url(message)
+        if url is None:
+            # Summarizing needs a url
+            return self._count({"intent": "None", "url": None, "tier": "rules"})
+        lowered = message.lower()
+        only_url = URL_RE.sub("", message).strip(" \t\n.,;:!?") == ""
+        if only_url or any(keyword in lowered for keyword in SUMMARIZE_KEYWORDS):
+            return self._count({"intent": "Summarize", "url": url, "tier": "rules"})
+        return None
+
+    def _load_centroids(self):
+        if self._centroids is not None:
+            return self._centroids
+        # Embedded outside the lock so a slow embedding API does not hold up
+        # tier counting; concurrent first calls may embed twice, the first result is kept
+        url = "https://example.com/page"
+        labels, centroids = [], []
+        for label, examples in CENTROID_EXAMPLES.items():
+            vectors = np.asarray(self.embed([e.format(url=url) for e in examples]), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            centroid = vectors.mean(axis=0)
+            labels.append(label)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        with self._lock:
+            if self._centroids is None:
+                self._centroids = (labels, np.stack(centroids))
+            return self._centroids
+
+    def route_centroid(self, message: str, embedding) -> dict | None:
+        """Nearest-centroid decision over the query embedding, None if not confident."""
+        if self.embed is None or embedding is None:
+            return None
+        labels, centroids = self._load_centroids()
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = centroids @ (query / np.linalg.norm(query))
+        order = np.argsort(scores)[::-1]
+        if scores[order[0]] - scores[order[1]] < self.centroid_margin:
+            return None
+        intent = labels[order[0]]
+        url = find_url(message) if intent == "Summarize" else None
+        return self._count({"intent": intent, "url": url, "tier": "centroid"})
+
+    def route_llm(self, message: str, ollama_client) -> dict:
+        text = intent_recognition(config.LLM_MODEL, ollama_client, message)
+        decision = parse_intent(text, find_url(message))
+        decision["tier"] = "llm"
+        return self._count(decision)
+
+    def route(self, message: str, ollama_client=None, embedding=None) -> dict:
+        return (
+            self.route_rules(message)
+            or self.route_centroid(message, embedding)
+            or self.route_llm(message, ollama_client)
+        )
+
+    async def aroute_llm(self, message: str) -> dict:
+        text = await aintent(config.LLM_MODEL, message)
+        decision = parse_intent(text, find_url(message))
+        decision["tier"] = "llm"
+        return self._count(decision)
+
+    async def aroute(self, message: str, embedding=None) -> dict:
+        """route() for async callers, the llm tier going through the gateway"""
+        decision = self.route_rules(message)
+        if decision is None and self._centroids is None and self.embed is not None and embedding is not None:
+            # The first call embeds the examples with the sync embed function
+            await asyncio.to_thread(self._load_centroids)
+        return decision or self.route_centroid(message, embedding) or await self.aroute_llm(message)
+
+# Labelled messages for benchmark_router
+LABELLED_MESSAGES = [
+    ("What is the refund policy in the uploaded contract?", "None"),
+    ("Giải thích định lý Pythagore", "None"),
+    ("Who wrote the second chapter?", "None"),
+    ("Mã sản phẩm SKU-4821 có trong tài liệu không?", "None"),
+    ("Summarize https://en.wikipedia.org/wiki/Retrieval-augmented_generation", "Summarize"),
+    ("tóm tắt giúp mình https://vnexpress.net/some-article.html", "Summarize"),
+    ("https://blog.example.com/post/123", "Summarize"),
+    ("tl;dr www.example.org/long-read", "Summarize"),
+    ("Can you give me the main points of https://example.com/report?", "Summarize"),
+    ("What does this page say? https://news.example.com/a", "Summarize"),
+    ("Is https://example.com safe to open?", "None"),
+    ("Why does https://api.example.com/v1 return 500?", "None"),
+    ("Trang https://example.vn có đáng tin không?", "None"),
+    ("Đọc giúp mình bài này https://example.vn/bai-viet", "Summarize"),
+]
+
+def benchmark_router(router: IntentRouter | None = None, ollama_client=None):
+    """
+    Report accuracy, tier usage and latency of the router on LABELLED_MESSAGES.
+    Without an embed function the centroid tier is skipped, and without a client
+    the messages left to the llm tier are skipped; both are reported as unmeasured.
+    """
+    router = router or IntentRouter()
+    correct, latencies = 0, {"rules": [], "centroid": [], "llm": []}
+    for message, expected in LABELLED_MESSAGES:
+        embedding = router.embed([message])[0] if router.embed else None
+        start = time.perf_counter()
+        decision = router.route_rules(message) or router.route_centroid(message, embedding)
+        if decision is None and ollama_client is None:
+            print(f"ambiguous without llm: {message}")
+            continue
+        decision = decision or router.route_llm(message, ollama_client)
+        latencies[decision["tier"]].append(time.perf_counter() - start)
+        correct += decision["intent"] == expected
+    decided = sum(len(v) for v in latencies.values())
+    print(f"accuracy: {correct}/{decided} decided, {len(LABELLED_MESSAGES)} total")
+    for tier, values in latencies.items():
+        if (tier == "centroid" and router.embed is None) or (tier == "llm" and ollama_client is None):
+            print(f"{tier}: unmeasured")
+        elif values:
+            print(f"{tier}: {len(values)} messages, mean {np.mean(values) * 1e6:.1f} us")
+        else:
+            print(f"{tier}: 0 messages")
+
+if __name__ == "__main__":
+    from rag_ui.inference.embed import embed_api
+    from rag_ui.inference.gateway import ollama_client
+
+    benchmark_router(IntentRouter(embed=embed_api), ollama_client)
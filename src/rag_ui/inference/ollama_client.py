@@ -1,7 +1,10 @@
 from ollama import Client
 
+from rag_ui.core.config import config
 from rag_ui.inference.prompt import construct_prompt
-from rag_ui.core.modules.product_search import websosanh_search
+from rag_ui.inference.session import chat_options
+from rag_ui.core.modules.product_search import awebsosanh_search
+from rag_ui.inference.gateway import gateway
 
 def fix_latex_response(response: str) -> str:
     response = response.replace('\\(', '$')
@@ -9,92 +12,187 @@ def fix_latex_response(response: str) -> str:
 
     return response
 
-def intent_recognition(
-        model: str, 
-        client: Client,
-        user_message: str = None
-    ):
+def intent_messages(user_message: str) -> list[dict]:
+    return [
+        {
+            "role": "system", 
+            "content": """You are great at recognizing the user's intent from their message,
+                if the user's intent is to summarize the content from an url, 
+                return a dict with the key 'Summarize' with the value being the url,
+                otherwise return a dict with the key 'None' and the value being 'None'.
+                Return only in a string so that i can directly pass that string into json.loads 
+                to get the dict, no additional words like: 'Here is the response', ...
+                """
+        },
+        {
+            "role": "user",
+            "content": user_message
+        }
+    ]
+
+async def aintent(model: str, user_message: str = None, client=gateway):
     """
     Add a layer to recognize user's intent
     Output should be ['None', 'Summarize']
+    Args:
+        client: Async chat client, the gateway by default
     """
-    response = client.chat(
-        model=model,
-        messages=[
-            {
-                "role": "system", 
-                "content": """You are great at recognizing the user's intent from their message,
-                    if the user's intent is to summarize the content from an url, 
-                    return a dict with the key 'Summarize' with the value being the url,
-                    otherwise return a dict with the key 'None' and the value being 'None'.
-                    Return only in a string so that i can directly pass that string into json.loads 
-                    to get the dict, no additional words like: 'Here is the response', ...
-                    """
-            },
-            {
-                "role": "user",
-                "content": user_message
-            }
-        ]
-    )
+    response = await client.chat(model, intent_messages(user_message), options=chat_options())
     intent = response['message']['content']
     return intent
 
+def intent_recognition(
+        model: str, 
+        client: Client,
+        user_message: str = None
+    ):
+    """Sync wrapper of aintent for the Dash callbacks, 'client' being the gateway's Ollama client"""
+    return gateway.run(aintent(model, user_message, client.gateway))
+
+def clean_chat_response(model: str, response: str) -> str:
+    """Drop the thinking section of deepseek models and fix the latex delimiters"""
+    if 'deepseek' in model:
+        response = response.split('</think>')[-1]
+    return fix_latex_response(response)
+
+async def achat_response(
+        model: str,
+        history: list[str],
+        context: str = None,
+        turns: list[dict] | None = None,
+        client=gateway,
+    ) -> str:
+    """Get ollama response"""
+    messages = construct_prompt(history=history, context=context, turns=turns)
+
+    final_response = await client.chat(model, messages, keep_alive=config.CHAT_KEEP_ALIVE, options=chat_options())
+    full_response = final_response['message']['content']
+
+    return clean_chat_response(model, full_response)
+
 def ollama_chat_response(
         model: str, 
         client: Client,
         history: list[str],
         tool_call=False, 
         context: str = None,
+        turns: list[dict] | None = None,
     ):    
-    """Get ollama response"""
-    messages = construct_prompt(history=history, context=context)
+    """Sync wrapper of achat_response for the Dash callbacks"""
+    return gateway.run(achat_response(model, history, context, turns, client.gateway))
 
-    final_response = client.chat(model, messages, keep_alive=-1)
-    full_response = final_response['message']['content']
+class ThinkFilter:
+    """
+    Drop the <think>...</think> section of deepseek models from a token stream,
+    the streaming equivalent of response.split('</think>')[-1].
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.passing = False
 
-    if 'deepseek' in model:
-        full_response = full_response.split('</think>')[-1]
+    def feed(self, token: str) -> str:
+        if self.passing:
+            return token
+        self.buffer += token
+        if '</think>' in self.buffer:
+            self.passing = True
+            return self.buffer.split('</think>', 1)[1]
+        # Answers that don't open with <think> are forwarded immediately
+        head = self.buffer.lstrip()[:len('<think>')]
+        if head and not '<think>'.startswith(head):
+            self.passing = True
+            return self.buffer
+        return ""
 
-    full_response = fix_latex_response(full_response)
+    def flush(self) -> str:
+        """Text held back when the stream ends without closing the think section"""
+        return "" if self.passing else self.buffer
 
-    return full_response
+async def achat_stream(
+        model: str,
+        history: list[str],
+        context: str = None,
+        turns: list[dict] | None = None,
+        client=gateway,
+    ):
+    """Yield the ollama response incrementally, as the tokens are generated"""
+    messages = construct_prompt(history=history, context=context, turns=turns)
+    think_filter = ThinkFilter() if 'deepseek' in model else None
 
-def ollama_product_call(
+    stream = client.chat_stream(model, messages, keep_alive=config.CHAT_KEEP_ALIVE, options=chat_options())
+    async for part in stream:
+        token = part['message']['content']
+        if think_filter:
+            token = think_filter.feed(token)
+        if token:
+            yield token
+    if think_filter and (rest := think_filter.flush()):
+        yield rest
+
+def ollama_chat_stream(
+        model: str, 
+        client: Client,
+        history: list[str],
+        context: str = None,
+        turns: list[dict] | None = None,
+    ):
+    """Sync generator over achat_stream for the Dash callbacks"""
+    return gateway.iterate(achat_stream(model, history, context, turns, client.gateway))
+
+def product_messages(user_message: str) -> list[dict]:
+    return [
+        {
+            "role": "system", 
+            "content": """You are great at recognizing if the user wants to buy something, 
+                response with only the word indicating the product the user wants to buy, 
+                'None' if the user does not want to buy anything"""
+        },
+        {
+            "role": "user",
+            "content": user_message
+        }
+    ]
+
+async def aproduct_keyword(model: str, user_message: str = None, client=gateway) -> str | None:
+    """The product the user wants to buy, None if they don't want to buy anything"""
+    response = await client.chat(model, product_messages(user_message), options=chat_options())
+    item = response['message']['content']
+    return None if item == 'None' else item
+
+def product_keyword(
         model: str,
         client: Client,
         user_message: str = None
-    ):
+    ) -> str | None:
+    """Sync wrapper of aproduct_keyword for the Dash callbacks"""
+    return gateway.run(aproduct_keyword(model, user_message, client.gateway))
+
+async def aproduct_call(model: str, user_message: str = None, client=gateway) -> str:
     """Heuristicly calling websosanh_search"""
     # Recognize user intent to buy something
-    response = client.chat(
-        model=model,
-        messages=[
-            {
-                "role": "system", 
-                "content": """You are great at recognizing if the user wants to buy something, 
-                    response with only the word indicating the product the user wants to buy, 
-                    'None' if the user does not want to buy anything"""
-            },
-            {
-                "role": "user",
-                "content": user_message
-            }
-        ]
-    )
-    item = response['message']['content']
+    item = await aproduct_keyword(model, user_message, client)
     json_res = ""
-    if item == 'None':
-        pass
-    else:
+    if item is not None:
         # Call the function
-        json_res = websosanh_search(keyword=item)
+        json_res = await awebsosanh_search(keyword=item)
     return json_res
 
+def ollama_product_call(
+        model: str,
+        client: Client,
+        user_message: str = None
+    ):
+    """Sync wrapper of aproduct_call"""
+    return gateway.run(aproduct_call(model, user_message, client.gateway))
+
+async def aembed_response(model: str, input: list[str], client=gateway) -> list[list[float]]:
+    response = await client.ollama_embed(model, input)
+    return response['embeddings']
+
 def ollama_embed_response(
         model: str, 
         client: Client,
         input: list[str], 
     ) -> list[list[float]]:
-    response = client.embed(model, input)
-    return response['embeddings']
\ No newline at end of file
+    """Sync wrapper of aembed_response"""
+    return gateway.run(aembed_response(model, input, client.gateway))
\ No newline at end of file
@@ -1,61 +1,144 @@
-def construct_prompt(history: list[str], context: str | None = None) -> list[dict]:
+import re
+
+from rag_ui.inference.tokens import count_tokens, count_tokens_many, truncate_tokens
+from rag_ui.inference.session import chat_sessions
+
+# A chunk is a duplicate when this share of its word 5-grams is already packed
+DUPLICATE_OVERLAP = 0.8
+
+def word_shingles(text: str, size: int = 5) -> set[tuple]:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))} if words else set()
+
+# Identical on every call so Ollama can reuse its cached prefix, keep it free of
+# per-request content and of indentation
+SYSTEM_PROMPT = """You are a precise and helpful AI assistant. Your task is to answer questions based on the provided context information. Always prioritize information from the context over your general knowledge.
+
+Each user message holds the question in <question> and the information to answer it in <context>. Use the previous messages of the conversation if the question is too vague on its own.
+
+Follow these exact guidelines:
+1. If the user wants to summarize content from a url, use the content provided in the context to response the user with a complete summarization;
+Else, keep answers concise (2-6 sentences) and directly address the question
+2. Format your entire response using markdown with MathJax support for equations
+3. For mathematical expressions, use single $ for inline math and double $$ for display math
+4. If the context doesn't contain the answer, state "I don't have enough information to answer this question" and suggest what information would be needed
+5. Structure your response: first provide the direct answer, then support with relevant details
+6. Respond in the same language as the user's question
+
+Do not:
+- Include any introductory phrases like "Based on the context..." or "According to the information provided..."
+- Ask the user for more information
+- Repeat the user's question
+- Mention that you're using context to answer
+- Include any self-references (e.g., "As an AI assistant...")"""
+
+def pack_context(
+        history: list[str],
+        chunks: list[str],
+        budget: int,
+        turns: list[dict] | None = None,
+        session_id: str | None = None,
+    ) -> tuple[list[str], str, list[dict] | None, dict]:
+    """
+    Fit the question, the context chunks and the past messages in 'budget' tokens,
+    in that priority order.
+
+    Chunks are kept in their ranking order, skipping those mostly covered by the
+    chunks already packed and those that no longer fit; the first chunk is truncated
+    rather than dropped. Past turns are windowed per session (see ChatSessions),
+    without turns the past user messages are added newest first while they fit.
+
+    Args:
+        history: [latest user message, previous user messages newest first]
+        chunks: Context chunks, best first
+        turns: Past user and assistant messages, oldest first
+    Returns:
+        (history, context, turns, counts), counts holding the packed token counts
+    """
+    question, past = history[0], (history[1:] if turns is None else [])
+    turns_text = [turn["content"] for turn in turns or []]
+    counts = count_tokens_many([question] + past + turns_text + chunks)
+    question_tokens = counts[0]
+    past_tokens = counts[1:1 + len(past)]
+    turn_tokens = counts[1 + len(past):1 + len(past) + len(turns_text)]
+    chunk_tokens = counts[1 + len(past) + len(turns_text):]
+    remaining = budget - question_tokens
+
+    packed, packed_shingles = [], set()
+    context_tokens, dropped, duplicates = 0, 0, 0
+    for chunk, tokens in zip(chunks, chunk_tokens):
+        shingles = word_shingles(chunk)
+        if shingles and len(shingles & packed_shingles) >= DUPLICATE_OVERLAP * len(shingles):
+            duplicates += 1
+            continue
+        if tokens > remaining:
+            if packed or remaining <= 0:
+                dropped += 1
+                continue
+            chunk = truncate_tokens(chunk, remaining)
+            tokens = count_tokens(chunk)
+        packed.append(chunk)
+        packed_shingles |= shingles
+        context_tokens += tokens
+        remaining -= tokens
+
+    kept = []
+    history_tokens = 0
+    for message, tokens in zip(past, past_tokens):
+        if tokens > remaining:
+            break
+        kept.append(message)
+        history_tokens += tokens
+        remaining -= tokens
+    dropped_messages = len(past) - len(kept)
+    if turns is not None:
+        turns = chat_sessions.window(session_id, turns, turn_tokens, max(remaining, 0))
+        history_tokens = sum(turn_tokens[len(turn_tokens) - len(turns):])
+        dropped_messages = len(turn_tokens) - len(turns)
+
+    counts = {
+        "question": question_tokens,
+        "history": history_tokens,
+        "context": context_tokens,
+        "total": question_tokens + history_tokens + context_tokens,
+        "budget": budget,
+        "chunks": len(packed),
+        "dropped_chunks": dropped,
+        "duplicate_chunks": duplicates,
+        "dropped_messages": dropped_messages,
+    }
+    return [question] + kept, "\n".join(packed), turns, counts
+
+def construct_prompt(
+        history: list[str],
+        context: str | None = None,
+        turns: list[dict] | None = None,
+    ) -> list[dict]:
     """
     Constructs and returns a list of messages with a predefined prompt format to pass to an LLM.
-    
+
+    The messages go from the most to the least stable: the fixed system prompt,
+    the past turns of the conversation, then the latest question with its context,
+    so consecutive calls of a conversation share the longest possible prefix.
+
     Args:
-        user_message: The user's question to be answered
+        history: [latest user message, previous user messages newest first],
+            the previous ones are only used without 'turns'
         context: Optional context information to answer the question
-        
+        turns: Past user and assistant messages, oldest first
+
     Returns:
-        A list of dictionaries representing the system and user messages
+        A list of dictionaries representing the system, past and latest messages
     """
     user_message = history[0]
-    if len(history) > 1:
-        past_messages = history[1:]
-        past_messages_text = "\n".join([f"User: {msg}" for msg in past_messages])
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if turns is not None:
+        messages += [{"role": turn["role"], "content": turn["content"]} for turn in turns]
     else:
-        past_messages_text = ""
-    
-    # RAG-based Q&A prompt (with context)
-    system_prompt = """
-    You are a precise and helpful AI assistant. Your task is to answer questions based on the provided context information. Always prioritize information from the context over your general knowledge.
-
-    Follow these exact guidelines:
-    1. If the user wants to summarize content from a url, use the content provided in the context to response the user with a complete summarization;
-    Else, keep answers concise (2-6 sentences) and directly address the question
-    2. Format your entire response using markdown with MathJax support for equations
-    3. For mathematical expressions, use single $ for inline math and double $$ for display math
-    4. If the context doesn't contain the answer, state "I don't have enough information to answer this question" and suggest what information would be needed
-    5. Structure your response: first provide the direct answer, then support with relevant details
-    6. Respond in the same language as the user's question
-    
-    Do not:
-    - Include any introductory phrases like "Based on the context..." or "According to the information provided..."
-    - Ask the user for more information
-    - Repeat the user's question
-    - Mention that you're using context to answer
-    - Include any self-references (e.g., "As an AI assistant...")
-    """
-
-    user_prompt = f"""
-    Based on the information in <context>, answer the question in <question>.
-    Use the additional context from <history> if needed if the current user message is too vague.
-    <history>
-    {past_messages_text}
-    </history>
-    <context>
-    {context}
-    </context>
-    <question>
-    {user_message}
-    </question>
-    """
-    print("user message", user_message)
-    print("context", context)
-    # Construct the messages list
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
-    
-    return messages
\ No newline at end of file
+        # Callers without turns only know the previous questions
+        messages += [{"role": "user", "content": message} for message in reversed(history[1:])]
+    messages.append({
+        "role": "user",
+        "content": f"<context>\n{context or ''}\n</context>\n<question>\n{user_message}\n</question>",
+    })
+    return messages
@@ -0,0 +1,58 @@
+import numpy as np
+
+def normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def mmr_select(
+        query_vector,
+        vectors,
+        k: int,
+        lambda_: float = 0.7,
+        relevance=None,
+        token_counts: list[int] | None = None,
+        token_budget: int | None = None,
+    ) -> list[int]:
+    """
+    Maximal marginal relevance: greedily pick the candidate maximizing
+        lambda_ * relevance - (1 - lambda_) * max similarity to the picked ones
+
+    The candidate-candidate cosine similarities are computed once as a matrix and
+    the redundancy term is updated with one vectorized max per pick.
+
+    Args:
+        query_vector: Query embedding
+        vectors: Candidate embeddings, one row per candidate
+        relevance: Relevance of each candidate, cosine similarity to the query if None
+        token_counts: Tokens of each candidate, candidates that no longer fit
+            in 'token_budget' are skipped
+    Returns:
+        Indices of the picked candidates, in pick order
+    """
+    vectors = normalize_rows(vectors)
+    n = len(vectors)
+    if n == 0 or k <= 0:
+        return []
+    if relevance is None:
+        relevance = vectors @ normalize_rows(query_vector)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    tokens = np.asarray(token_counts if token_counts is not None else np.zeros(n), dtype=np.int64)
+    budget = token_budget if token_budget is not None else np.inf
+
+    picked = []
+    while len(picked) < k:
+        available &= tokens <= budget
+        if not available.any():
+            break
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        budget -= tokens[best]
+        np.maximum(redundancy, similarity[:, best], out=redundancy)
+    return picked
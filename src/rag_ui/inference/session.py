@@ -0,0 +1,124 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+from ollama import Client
+
+from rag_ui.core.config import config
+
+def chat_options() -> dict:
+    """
+    Options of every call to LLM_MODEL. Ollama reloads the model, and drops its
+    prompt cache, whenever num_ctx changes between calls, so intent, summary and
+    answer calls must all share the same one.
+    """
+    return {"num_ctx": config.CHAT_NUM_CTX} if config.CHAT_NUM_CTX else {}
+
+class ChatSessions:
+    """
+    Per conversation window of past turns sent to the model.
+
+    Ollama reuses the KV cache of the longest prefix shared with the previous
+    request, so the turns sent for a conversation must only grow at the end.
+    When they no longer fit the budget, the oldest turns are dropped until they
+    take at most half of it, then the window stays put for the next turns
+    instead of sliding, and changing the prefix, on every message.
+    """
+    def __init__(self, max_sessions: int = 1024, ttl: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict() # session id -> {"start", "used"}
+        self._lock = threading.Lock()
+
+    def window(self, session_id: str | None, turns: list[dict], counts: list[int], budget: int) -> list[dict]:
+        """
+        Args:
+            turns: Past user and assistant messages of the conversation, oldest first
+            counts: Tokens of each turn
+            budget: Tokens left for the turns
+        Returns:
+            The turns to send, a suffix of 'turns' starting with a user message
+        """
+        now = time.time()
+        with self._lock:
+            state = self._sessions.pop(session_id, None) if session_id else None
+            if state is None or now - state["used"] > self.ttl:
+                state = {"start": 0, "used": now}
+            start = min(state["start"], len(turns))
+            if sum(counts[start:]) > budget:
+                while start < len(turns) and sum(counts[start:]) > budget // 2:
+                    start += 1
+            # A window never opens on an assistant answer
+            while start < len(turns) and turns[start]["role"] != "user":
+                start += 1
+            state["start"], state["used"] = start, now
+            if session_id:
+                self._sessions[session_id] = state
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+        return turns[start:]
+
+    def end(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+chat_sessions = ChatSessions(ttl=config.CHAT_SESSION_TTL)
+
+def benchmark_prefill(client: Client, n_turns: int = 10):
+    """
+    Prompt evaluation time of each turn of one conversation, with the previous
+    layout (past questions and context in an indented user turn) and the current
+    one (fixed system prompt, past turns as chat messages).
+    """
+    from rag_ui.inference.prompt import SYSTEM_PROMPT, construct_prompt
+
+    context = "\n".join(
+        f"File: manual.pdf\nRelevance Text: Section {i} describes the setting number {i} of the device."
+        for i in range(3)
+    )
+    questions = [f"What does setting number {i} of the device do?" for i in range(n_turns)]
+
+    def legacy_messages(history: list[str]) -> list[dict]:
+        past_messages_text = "\n".join([f"User: {msg}" for msg in history[1:]])
+        return [
+            {"role": "system", "content": "\n    " + SYSTEM_PROMPT.replace("\n", "\n    ")},
+            {"role": "user", "content": f"""
+    Based on the information in <context>, answer the question in <question>.
+    <history>
+    {past_messages_text}
+    </history>
+    <context>
+    {context}
+    </context>
+    <question>
+    {history[0]}
+    </question>
+    """},
+        ]
+
+    def run(name: str, build):
+        turns = []
+        total_ms = 0.0
+        for i, question in enumerate(questions):
+            history = [question] + questions[:i][::-1]
+            response = client.chat(
+                config.LLM_MODEL, build(history, turns),
+                keep_alive=config.CHAT_KEEP_ALIVE, options=chat_options(),
+            )
+            prefill_ms = response.get("prompt_eval_duration", 0) / 1e6
+            total_ms += prefill_ms
+            print(f"{name} turn {i + 1}: {response.get('prompt_eval_count', 0)} tokens evaluated, {prefill_ms:.0f}ms")
+            turns += [
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": response["message"]["content"]},
+            ]
+        print(f"{name}: {total_ms:.0f}ms prefill over {n_turns} turns")
+
+    run("before", lambda history, turns: legacy_messages(history[:2]))
+    run("after", lambda history, turns: construct_prompt(history, context, turns))
+
+if __name__ == "__main__":
+    from rag_ui.inference.gateway import ollama_client
+
+    benchmark_prefill(ollama_client, int(sys.argv[1]) if len(sys.argv) > 1 else 10)
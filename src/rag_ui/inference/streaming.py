@@ -0,0 +1,125 @@
+import time
+import uuid
+import threading
+from typing import Iterable, Iterator
+
+class TokenStream:
+    """Tokens produced so far by one generation."""
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.finished_at = None
+        self.condition = threading.Condition()
+
+class StreamRegistry:
+    """
+    In-process registry of running generations.
+
+    start() consumes a token iterator in a background thread; any number of readers
+    can then follow() the stream from the beginning (e.g. the SSE route), and the
+    final text is available through result() once the generation is done.
+    Finished streams are dropped after 'ttl' seconds.
+    """
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def _cleanup(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                stream_id for stream_id, stream in self._streams.items()
+                if stream.done and now - stream.finished_at > self.ttl
+            ]
+            for stream_id in expired:
+                del self._streams[stream_id]
+
+    def start(self, tokens: Iterable[str]) -> str:
+        """Start consuming 'tokens' in the background and return the stream id."""
+        self._cleanup()
+        stream_id = uuid.uuid4().hex
+        stream = TokenStream()
+        with self._lock:
+            self._streams[stream_id] = stream
+        threading.Thread(target=self._run, args=(stream, tokens), daemon=True).start()
+        return stream_id
+
+    def _run(self, stream: TokenStream, tokens: Iterable[str]):
+        try:
+            for token in tokens:
+                if stream.cancelled:
+                    # Closing the generator also closes the upstream connection
+                    if hasattr(tokens, "close"):
+                        tokens.close()
+                    break
+                with stream.condition:
+                    stream.tokens.append(token)
+                    stream.condition.notify_all()
+        except Exception as e:
+            stream.error = str(e)
+        finally:
+            with stream.condition:
+                stream.done = True
+                stream.finished_at = time.monotonic()
+                stream.condition.notify_all()
+
+    def cancel(self, stream_id: str) -> bool:
+        """Stop a running stream after its next token"""
+        stream = self.get(stream_id)
+        if stream is None or stream.done:
+            return False
+        stream.cancelled = True
+        return True
+
+    def get(self, stream_id: str) -> TokenStream | None:
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def finished(self, stream_id: str) -> bool:
+        """True once the stream is done, or unknown (already collected or expired)"""
+        stream = self.get(stream_id)
+        return stream is None or stream.done
+
+    def follow(self, stream_id: str, heartbeat: float = 15) -> Iterator[str | None]:
+        """
+        Yield the tokens of a stream from the beginning until it is done.
+        Yields None every 'heartbeat' seconds without tokens so callers can keep connections alive.
+        """
+        stream = self.get(stream_id)
+        if stream is None:
+            return
+        index = 0
+        while True:
+            with stream.condition:
+                if index == len(stream.tokens) and not stream.done:
+                    stream.condition.wait(timeout=heartbeat)
+                new_tokens = stream.tokens[index:]
+                done = stream.done
+            index += len(new_tokens)
+            if new_tokens:
+                yield from new_tokens
+            elif not done:
+                yield None
+            if done and index == len(stream.tokens):
+                return
+
+    def result(self, stream_id: str, timeout: float | None = None) -> tuple[str | None, str | None]:
+        """
+        Wait for a stream to finish and remove it.
+        Returns:
+            (text, error), text is None if the stream is unknown or still running after 'timeout'.
+        """
+        stream = self.get(stream_id)
+        if stream is None:
+            return None, "Stream not found"
+        with stream.condition:
+            if not stream.condition.wait_for(lambda: stream.done, timeout=timeout):
+                return None, "Stream timed out"
+        with self._lock:
+            self._streams.pop(stream_id, None)
+        return "".join(stream.tokens), stream.error
+
+token_streams = StreamRegistry()
@@ -0,0 +1,154 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ollama import Client
+
+from rag_ui.core.config import config
+from rag_ui.core.jobs import JobCancelled
+from rag_ui.inference.ollama_client import clean_chat_response, ollama_chat_response
+from rag_ui.inference.session import chat_options
+from rag_ui.inference.tokens import count_tokens, count_tokens_many
+
+# Bounded pool shared by all map steps, so long pages cannot flood Ollama
+summary_executor = ThreadPoolExecutor(max_workers=config.SUMMARY_WORKERS, thread_name_prefix="summary")
+
+def section_messages(section: str, question: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": """You summarize one section of a longer text. Keep every fact,
+                name, number and date that could matter for the user's request, drop the rest.
+                Answer with a few concise bullet points in the language of the text,
+                no introduction and no conclusion."""
+        },
+        {
+            "role": "user",
+            "content": f"<request>\n{question}\n</request>\n<section>\n{section}\n</section>"
+        }
+    ]
+
+def split_sections(text: str, max_tokens: int) -> list[str]:
+    """
+    Split text into sections of at most 'max_tokens', on paragraph boundaries
+    where possible and on word boundaries for paragraphs longer than a section.
+    """
+    sections = []
+    current, current_tokens = [], 0
+    paragraphs = text.split('\n')
+    for paragraph, tokens in zip(paragraphs, count_tokens_many(paragraphs)):
+        if tokens > max_tokens:
+            words = paragraph.split()
+            step = max(1, len(words) * max_tokens // tokens)
+            pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            counts = count_tokens_many(pieces)
+        else:
+            pieces, counts = [paragraph], [tokens]
+        for piece, tokens in zip(pieces, counts):
+            if current and current_tokens + tokens > max_tokens:
+                sections.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+def summarize_section(model: str, client: Client, section: str, question: str) -> str:
+    response = client.chat(
+        model=model, messages=section_messages(section, question),
+        keep_alive=config.CHAT_KEEP_ALIVE, options=chat_options()
+    )
+    return clean_chat_response(model, response['message']['content'])
+
+def map_summaries(
+        model: str,
+        client: Client,
+        text: str,
+        question: str,
+        section_tokens: int,
+        cancel_event=None,
+        max_sections: int | None = None,
+    ) -> list[str]:
+    """
+    Summarize the sections of 'text' concurrently, in order. Only the first
+    'max_sections' sections are summarized, and sections not started yet are
+    abandoned once 'cancel_event' is set.
+    """
+    sections = split_sections(text, section_tokens)[:max_sections]
+
+    def summarize(section: str) -> str:
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled()
+        return summarize_section(model, client, section, question)
+
+    return list(summary_executor.map(summarize, sections))
+
+def join_summaries(summaries: list[str]) -> str:
+    return "\n\n".join(f"Part {i + 1}:\n{summary}" for i, summary in enumerate(summaries))
+
+def summarize_context(
+        client: Client,
+        text: str,
+        question: str,
+        timings: dict | None = None,
+        cancel_event=None,
+    ) -> str:
+    """
+    Context for a summary answer: the text itself when it fits in
+    SUMMARY_SINGLE_PASS_TOKENS, otherwise the partial summaries of its sections.
+    The answer itself is the final reduce step.
+
+    Pages are cut after SUMMARY_MAX_SECTIONS sections, and the partial summaries
+    are summarized again, at most SUMMARY_MAX_LEVELS times, until they fit in
+    SUMMARY_SINGLE_PASS_TOKENS and the prompt budget, so no part of the summarized
+    text is dropped when the prompt is packed.
+    """
+    timings = timings if timings is not None else {}
+    target = min(config.SUMMARY_SINGLE_PASS_TOKENS, config.PROMPT_TOKEN_BUDGET - count_tokens(question))
+    tokens = count_tokens(text)
+    timings["summary_tokens"] = tokens
+    if tokens <= target:
+        timings["summary_mode"] = "single-pass"
+        return text
+    start = time.perf_counter()
+    timings["summary_mode"] = "map-reduce"
+    timings["summary_levels"] = 0
+    total_sections = len(split_sections(text, config.SUMMARY_SECTION_TOKENS))
+    if total_sections > config.SUMMARY_MAX_SECTIONS:
+        print(f"Summarizing the first {config.SUMMARY_MAX_SECTIONS} of {total_sections} sections")
+        timings["summary_skipped_sections"] = total_sections - config.SUMMARY_MAX_SECTIONS
+    while tokens > target and timings["summary_levels"] < config.SUMMARY_MAX_LEVELS:
+        summaries = map_summaries(
+            config.LLM_MODEL, client, text, question, config.SUMMARY_SECTION_TOKENS,
+            cancel_event, config.SUMMARY_MAX_SECTIONS,
+        )
+        if timings["summary_levels"] == 0:
+            timings["summary_sections"] = len(summaries)
+        timings["summary_levels"] += 1
+        text = join_summaries(summaries)
+        tokens = count_tokens(text)
+    timings["map"] = time.perf_counter() - start
+    return text
+
+def benchmark_summarize(client: Client, text: str, question: str = "Summarize this page"):
+    """Latency of a single-pass and a map-reduce summary of the same text."""
+    print(f"{count_tokens(text)} tokens, {len(split_sections(text, config.SUMMARY_SECTION_TOKENS))} sections")
+
+    start = time.perf_counter()
+    ollama_chat_response(model=config.LLM_MODEL, client=client, history=[question], context=text)
+    print(f"single-pass: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    summaries = map_summaries(config.LLM_MODEL, client, text, question, config.SUMMARY_SECTION_TOKENS)
+    map_time = time.perf_counter() - start
+    context = join_summaries(summaries)
+    ollama_chat_response(model=config.LLM_MODEL, client=client, history=[question], context=context)
+    total = time.perf_counter() - start
+    print(f"map-reduce: {total:.2f}s (map {map_time:.2f}s, reduce {total - map_time:.2f}s)")
+
+if __name__ == "__main__":
+    from rag_ui.core.modules.web import get_raw
+    from rag_ui.inference.gateway import ollama_client
+
+    benchmark_summarize(ollama_client, get_raw(sys.argv[1]))
@@ -0,0 +1,54 @@
+import threading
+
+from rag_ui.core.config import config
+
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about 4 characters per token"""
+    return max(1, len(text) // 4)
+
+def get_tokenizer(name: str | None = None):
+    """
+    The Hugging Face tokenizer of the chat model (TOKENIZER_NAME), loaded once per
+    process and from the local Hugging Face cache after the first download.
+    None when no tokenizer is configured or it cannot be loaded.
+    """
+    name = name if name is not None else config.TOKENIZER_NAME
+    if not name:
+        return None
+    with _tokenizers_lock:
+        if name not in _tokenizers:
+            try:
+                from transformers import AutoTokenizer
+
+                _tokenizers[name] = AutoTokenizer.from_pretrained(name)
+            except Exception as e:
+                print(f"Tokenizer {name} unavailable, estimating token counts: {e}")
+                _tokenizers[name] = None
+        return _tokenizers[name]
+
+def count_tokens_many(texts: list[str]) -> list[int]:
+    """Token count of each text, tokenized as one batch"""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [estimate_tokens(text) for text in texts]
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+def count_tokens(text: str) -> int:
+    return count_tokens_many([text])[0]
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of 'text' with at most 'max_tokens' tokens"""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[:max_tokens * 4]
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    if len(ids) <= max_tokens:
+        return text
+    return tokenizer.decode(ids[:max_tokens])
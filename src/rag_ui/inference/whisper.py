@@ -1,13 +1,28 @@
-import requests
+import asyncio
 
 from rag_ui.core.config import config
+from rag_ui.inference.gateway import gateway
 
 WHISPER_URL = config.WHISPER_NGROK_URL + "/transcribe"
 
-def whisper_api(filepath) -> str:
-    with open(filepath, "rb") as f:
-        files = {"file": f}
-        headers = {"accept": "application/json"}
-        response = requests.post(WHISPER_URL, files=files, headers=headers)
-        transcribed = response.json()['transcribe']
-        return transcribed
\ No newline at end of file
+def read_audio(audio) -> bytes:
+    if isinstance(audio, (bytes, bytearray)):
+        return audio
+    with open(audio, "rb") as f:
+        return f.read()
+
+async def awhisper(audio) -> str:
+    """
+    Transcribe audio with the Whisper API, through the gateway.
+    Args:
+        audio: Path to a WAV file, or the WAV file content as bytes.
+    """
+    headers = {"accept": "application/json"}
+    audio = await asyncio.to_thread(read_audio, audio)
+    files = {"file": ("audio.wav", audio, "audio/wav")}
+    response = await gateway.post_json("whisper", WHISPER_URL, files=files, headers=headers)
+    return response['transcribe']
+
+def whisper_api(audio) -> str:
+    """Sync wrapper of awhisper for the Dash callbacks"""
+    return gateway.run(awhisper(audio))
@@ -1,6 +1,11 @@
+import json
+
 import dash
 import ffmpeg
-from flask import request
+from flask import request, Response, redirect, stream_with_context
+
+from rag_ui.inference.streaming import token_streams
+from rag_ui.core.modules.thumbnail import get_thumbnail, verify_url
 
 # Include Font Awesome for icons.
 external_stylesheets = [
@@ -30,6 +35,48 @@ def save_audio():
     except ffmpeg.Error as e:
         print(f"Error ffmpeg conversion: {e}")
 
+@app.server.route("/stream/<stream_id>")
+def stream_answer(stream_id):
+    """Server-sent events with the tokens of a running answer, then a 'done' event."""
+    if token_streams.get(stream_id) is None:
+        return {"message": "Stream not found", "code": 404}, 404
+
+    def events():
+        for token in token_streams.follow(stream_id):
+            if token is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.server.route("/thumbnail/<signature>")
+def product_thumbnail(signature):
+    """
+    Resized, locally cached product image. The url is signed by thumbnail_url so
+    only images linked by the app are proxied; thumbnails never change for a url,
+    the browser keeps them for a year.
+    """
+    url = request.args.get("url", "")
+    if not verify_url(url, signature):
+        return {"message": "Invalid thumbnail url", "code": 403}, 403
+    try:
+        data = get_thumbnail(url)
+    except Exception as e:
+        print(f"Thumbnail of {url} failed: {e}")
+        # The card still shows the original image
+        return redirect(url)
+    return Response(
+        data,
+        mimetype="image/jpeg",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
 
 if __name__ == '__main__':
     app.run(debug=False)
@@ -0,0 +1,44 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    streaming: {
+        source: null,
+
+        // Same replacements as fix_latex_response on the server
+        fixLatex: function(text) {
+            return text.replaceAll("\\(", "$").replaceAll("\\)", "$");
+        },
+
+        followStream: function(streamId) {
+            const ns = window.dash_clientside.streaming;
+            if (!streamId) return window.dash_clientside.no_update;
+            if (ns.source) ns.source.close();
+
+            let text = "";
+            let finished = false;
+            const source = new EventSource(`/stream/${streamId}`);
+            ns.source = source;
+
+            const finish = () => {
+                if (finished) return;
+                finished = true;
+                source.close();
+                ns.source = null;
+                // The server callback stores the final answer in the conversation
+                window.dash_clientside.set_props("stream-done", {data: streamId});
+            };
+
+            source.onmessage = event => {
+                const data = JSON.parse(event.data);
+                if (!text) {
+                    window.dash_clientside.set_props("streaming-dots", {style: {display: "none"}});
+                }
+                text += data.token;
+                window.dash_clientside.set_props("streaming-answer", {children: ns.fixLatex(text)});
+            };
+            source.addEventListener("done", finish);
+            // Lost connection: the server still collects the full answer
+            source.onerror = finish;
+
+            return window.dash_clientside.no_update;
+        }
+    }
+});
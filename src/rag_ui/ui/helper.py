@@ -1,7 +1,10 @@
 import os
 import json
+import uuid
 from dash import html
 
+from rag_ui.core.modules.thumbnail import thumbnail_url
+
 def save_uploaded_file(file_content, filename, folder):
     """Saves uploaded file to the specified directory."""
     file_path = os.path.join(folder, filename)
@@ -25,13 +28,37 @@ def get_history(conversation, depth: int = 2) -> list:
             depth -= 1
     return history
 
-def create_product_div(json_res):
+def get_turns(conversation) -> list[dict]:
+    """
+    Past turns to send to the model as chat messages, oldest first: the user
+    messages that got a text answer, each followed by that answer.
+    """
+    turns = []
+    for question, answer in zip(conversation, conversation[1:]):
+        if question["role"] != "user" or answer["role"] != "assistant":
+            continue
+        if answer.get("loading") or answer.get("streaming") or answer.get("json_res") or not answer.get("content"):
+            continue
+        turns.append({"role": "user", "content": question["content"]})
+        turns.append({"role": "assistant", "content": answer["content"]})
+    return turns
+
+def get_session_id(conversation) -> str:
+    """Id of the chat session, carried by its user messages, new for an empty conversation"""
+    for msg in conversation or []:
+        if msg.get("session_id"):
+            return msg["session_id"]
+    return uuid.uuid4().hex
+
+def create_product_div(json_res, show_more_index: int | None = None):
     """
     Create a clean product display with each product on its own row,
     image on the right, and light grey background.
     
     Args:
         json_res (str): JSON string containing product information
+        show_more_index (int): Index of the message in the conversation, adds a
+            "show more" button loading the next products when set
         
     Returns:
         html.Div: A styled Dash HTML Div component displaying product information in rows
@@ -106,7 +133,7 @@ def create_product_div(json_res):
                 html.Div([
                     html.A([
                         html.Img(
-                            src=product.get('image', ''),
+                            src=thumbnail_url(product.get('image', '')),
                             style={
                                 'height': '120px',
                                 'width': '120px',
@@ -147,6 +174,17 @@ def create_product_div(json_res):
                 'margin': '0 auto',
                 'padding': '10px 20px'
             }),
+            html.Div(
+                html.Button("Xem thêm", id={"type": "show-more-products", "index": show_more_index}, style={
+                    'background': '#303030',
+                    'border': '1px solid white',
+                    'borderRadius': '6px',
+                    'color': '#fff',
+                    'padding': '6px 16px',
+                    'cursor': 'pointer'
+                }),
+                style={'textAlign': 'center', 'marginBottom': '10px'}
+            ) if show_more_index is not None else None,
             html.Div([
                 html.P("Tìm kiếm sản phẩm khác?", style={
                     'textAlign': 'center',
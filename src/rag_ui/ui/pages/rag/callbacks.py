@@ -1,23 +1,34 @@
 import os
-import base64
 import json
+import base64
 
-from dash import html, no_update, Input, Output, State, clientside_callback, ClientsideFunction, callback, dcc
+from dash import html, no_update, Input, Output, State, clientside_callback, ClientsideFunction, callback, dcc, ctx, ALL
 
-from rag_ui.inference.ollama_client import ollama_chat_response, ollama_product_call, intent_recognition
 from rag_ui.core.config import config
-from rag_ui.ui.helper import get_history, save_uploaded_file, create_product_div
+from rag_ui.inference.ollama_client import fix_latex_response
+from rag_ui.inference.answer import generate_answer, answer_jobs
+from rag_ui.inference.streaming import token_streams
+from rag_ui.core.jobs import JobQueueFull
+from rag_ui.ui.helper import get_history, get_turns, get_session_id, save_uploaded_file, create_product_div
+from rag_ui.inference.session import chat_sessions
 from rag_ui.ui.pages.rag.layout import bottom_style, center_style
-from rag_ui.data.preprocessing import to_text
-from rag_ui.db.vectorstore import insert_batch, get_search_results
+from rag_ui.db.vectorstore import insert_batch
+from rag_ui.core.modules.product_search import websosanh_search
 from rag_ui.core.modules.speech_enhance import enhance
 from rag_ui.inference.whisper import whisper_api
-from rag_ui.inference.embed import embed_api
-from rag_ui.core.modules.web import get_raw
 
 
 UPLOAD_FOLDER = "./src/rag_ui/data/documents/"
 
+def store_stream_result(msg: dict):
+    """Replace the streaming message's content with the finished stream's text"""
+    text, error = token_streams.result(msg["stream_id"], timeout=0)
+    if error:
+        msg["content"] = f"Request failed: {error}"
+    else:
+        msg["content"] = fix_latex_response(text)
+    msg["streaming"] = False
+
 def register_callbacks(*args):
     # -------------------------------------------------------------------------------
     # When the user clicks the button or presses Enter and there is text:
@@ -46,7 +57,7 @@ def register_callbacks(*args):
         new_conversation = list(conversation) if conversation else []
 
         # Append the user's message.
-        new_conversation.append({"role": "user", "content": text})
+        new_conversation.append({"role": "user", "content": text, "session_id": get_session_id(conversation)})
         # Append a placeholder assistant response, marked as loading.
         new_conversation.append({"role": "assistant", "content": "", "loading": True})
 
@@ -79,7 +90,7 @@ def register_callbacks(*args):
             return []
         
         messages = []
-        for msg in conversation:
+        for i, msg in enumerate(conversation):
             base_style = {
                 "margin": "10px 20px",
                 "padding": "10px",
@@ -114,9 +125,27 @@ def register_callbacks(*args):
                         [html.Span(), html.Span(), html.Span()],
                         className="loading-dots"
                     )
+                elif msg.get("streaming"):
+                    # Filled token by token from the browser (assets/stream.js)
+                    content = html.Div([
+                        html.Div(
+                            [html.Span(), html.Span(), html.Span()],
+                            id="streaming-dots",
+                            className="loading-dots"
+                        ),
+                        dcc.Markdown(
+                            "",
+                            id="streaming-answer",
+                            mathjax=True,
+                            style={"color": "#fff"}
+                        ),
+                    ])
                 else:
                     if msg['json_res']:
-                        content = create_product_div(msg["json_res"]) # Create a html.Div with the product info
+                        # Create a html.Div with the product info
+                        content = create_product_div(
+                            msg["json_res"], show_more_index=i if msg.get("product_keyword") else None
+                        )
                     else:
                         content = dcc.Markdown(
                             msg["content"],
@@ -127,92 +156,184 @@ def register_callbacks(*args):
         return html.Div(messages, style={"display": "flex", "flexDirection": "column"})
 
     # -------------------------------------------------------------------------------
-    # On each interval:
-    #   1. Look for the latest assistant message with loading=True.
+    # When the conversation changes:
+    #   1. Look for the first assistant message with loading=True.
     #   2. Construct the conversation in the format required by ollama_chat_response,
-    #      excluding that loading message itself.
-    #   3. Call ollama_chat_response to get the model's answer.
-    #   4. Update that assistant message with the answer and set loading=False.
+    #      excluding that loading message itself: the latest user messages for retrieval
+    #      and the past turns, sent as chat messages.
+    #   3. Submit generate_answer to the background job queue, store the job id on
+    #      the message and start polling it (see poll_answer).
     # -------------------------------------------------------------------------------
     @callback(
         Output("conversation-store", "data", allow_duplicate=True),
+        Output("answer-poll", "disabled"),
         Input("conversation-store", "data"),
         State("search-product-mode", "data"),
         prevent_initial_call=True
     )
     def update_machine_answer(conversation, search):
         if not conversation:
-            return no_update
+            return no_update, no_update
 
         new_conversation = conversation.copy()
         for i, msg in enumerate(new_conversation):
+            # One answer at a time, the next one starts when it is stored
+            if msg.get("job_id") or msg.get("streaming"):
+                return no_update, no_update
             # Identify the first assistant message that is loading
             if msg.get("role") == "assistant" and msg.get("loading"):
+                history = get_history(new_conversation, depth=2)
+                turns = get_turns(new_conversation[:i - 1])
+                session_id = get_session_id(new_conversation)
                 try:
-                    json_res = ""
-                    history = get_history(new_conversation, depth=2)
-                    latest_user_message = history[0]
+                    new_conversation[i]["job_id"] = answer_jobs.submit(
+                        generate_answer, args[0], args[1], history, bool(search), turns, session_id
+                    )
+                except JobQueueFull:
+                    new_conversation[i]["loading"] = False
+                    new_conversation[i]["content"] = "The server is busy, please try again in a moment."
+                    new_conversation[i]["json_res"] = ""
+                    return new_conversation, no_update
+                return new_conversation, False
+        return no_update, no_update
 
-                    if not search:
-                        # Add a layer to recognize user's intent
-                        intent_json = intent_recognition(
-                            config.LLM_MODEL, args[1], latest_user_message
-                        )
-                        intent = json.loads(intent_json)
-                        if intent.get('Summarize'):
-                            url = intent.get('Summarize')
-                            context = get_raw(url)
-                            history = [latest_user_message]
-                        else:
-                            # embedding = ollama_embed_response(config.EMBEDDING_MODEL, args[1], [latest_user_message])[0]
-                            embedding = embed_api([latest_user_message])[0]
-                            # Search for similar embeddings in the Milvus database
-                            search_res = get_search_results(args[0], "documents", embedding, ["text", "file_path"])
-                            retrieved = [(res["entity"]["file_path"], res["entity"]["text"]) for res in search_res[0]]
-                            context = "\n".join([f"File: {file_path}\nRelevance Text: {text}" for file_path, text in retrieved])
-                        # Get the assistant's response from Ollama
-                        answer = ollama_chat_response(
-                            model=config.LLM_MODEL,
-                            client=args[1],
-                            history=history,
-                            context=context,
-                        )
-                    else:
-                        answer = ""
-                        json_res = ollama_product_call(
-                            model=config.LLM_MODEL,
-                            client=args[1],
-                            user_message=latest_user_message
-                        )
+    # -------------------------------------------------------------------------------
+    # On each poll, check the pending answer job:
+    #   - still queued or running: nothing to do.
+    #   - done: update the assistant message with the answer and set loading=False,
+    #     or mark it as streaming and hand the stream id to the browser.
+    # Polling stops once no message is waiting for a job.
+    # -------------------------------------------------------------------------------
+    @callback(
+        Output("conversation-store", "data", allow_duplicate=True),
+        Output("stream-store", "data"),
+        Output("answer-poll", "disabled", allow_duplicate=True),
+        Input("answer-poll", "n_intervals"),
+        State("conversation-store", "data"),
+        prevent_initial_call=True
+    )
+    def poll_answer(n_intervals, conversation):
+        if not conversation:
+            return no_update, no_update, True
 
-                except Exception as e:
-                    answer = f"Request failed: {str(e)}"
+        new_conversation = conversation.copy()
+        for msg in new_conversation:
+            if msg.get("streaming") and not msg.get("job_id"):
+                # The browser gave up on the stream before it ended, see finish_stream
+                if not token_streams.finished(msg["stream_id"]):
+                    return no_update, no_update, no_update
+                store_stream_result(msg)
+                return new_conversation, no_update, True
+            if not msg.get("job_id"):
+                continue
+            job = answer_jobs.status(msg["job_id"])
+            if job["status"] in ("queued", "running"):
+                return no_update, no_update, no_update
 
-                # Update the pending assistant message with the new answer
-                new_conversation[i]["loading"] = False
-                new_conversation[i]["content"] = answer
-                new_conversation[i]["json_res"] = json_res
+            if job["status"] == "done":
+                answer = job["result"]
+            else:
+                answer = {
+                    "content": f"Request failed: {job.get('error', job['status'])}",
+                    "json_res": "",
+                    "stream_id": None,
+                    "timings": {},
+                }
+            del msg["job_id"]
+            msg["loading"] = False
+            msg["content"] = answer["content"]
+            msg["json_res"] = answer["json_res"]
+            msg["product_keyword"] = answer.get("product_keyword")
+            msg["timings"] = answer["timings"]
+            if answer["stream_id"]:
+                msg["streaming"] = True
+                msg["stream_id"] = answer["stream_id"]
+                return new_conversation, answer["stream_id"], True
+            return new_conversation, no_update, True
+        return no_update, no_update, True
 
-                return new_conversation
-        return no_update
+    # -------------------------------------------------------------------------------
+    # "Show more" under a product answer appends the next products of the same
+    # search, fetched from websosanh.vn only when not cached yet. The button is
+    # removed once the results run out.
+    # -------------------------------------------------------------------------------
+    @callback(
+        Output("conversation-store", "data", allow_duplicate=True),
+        Input({"type": "show-more-products", "index": ALL}, "n_clicks"),
+        State("conversation-store", "data"),
+        prevent_initial_call=True
+    )
+    def show_more_products(n_clicks, conversation):
+        # Buttons rendered again with the conversation trigger with no clicks
+        if not ctx.triggered_id or not ctx.triggered[0]["value"] or not conversation:
+            return no_update
+        i = ctx.triggered_id["index"]
+        if i >= len(conversation) or not conversation[i].get("product_keyword"):
+            return no_update
+        new_conversation = conversation.copy()
+        msg = dict(new_conversation[i])
+        products = json.loads(msg["json_res"] or "[]")
+        try:
+            more = json.loads(websosanh_search(msg["product_keyword"], offset=len(products)))
+        except Exception as e:
+            print(f"Product search failed: {e}")
+            return no_update
+        if len(more) < config.PRODUCT_SEARCH_ROWS:
+            msg["product_keyword"] = None
+        msg["json_res"] = json.dumps(products + more)
+        new_conversation[i] = msg
+        return new_conversation
+
+    # -------------------------------------------------------------------------------
+    # When the browser has received the whole stream, store the final answer
+    # in the conversation.
+    # When the browser gives up early (SSE error or reconnect) the generation is
+    # still running: answer-poll is turned back on and poll_answer stores it once
+    # done, instead of holding a server worker until then.
+    # -------------------------------------------------------------------------------
+    @callback(
+        Output("conversation-store", "data", allow_duplicate=True),
+        Output("answer-poll", "disabled", allow_duplicate=True),
+        Input("stream-done", "data"),
+        State("conversation-store", "data"),
+        prevent_initial_call=True
+    )
+    def finish_stream(stream_id, conversation):
+        if not stream_id or not conversation:
+            return no_update, no_update
+        new_conversation = conversation.copy()
+        for msg in new_conversation:
+            if msg.get("stream_id") == stream_id and msg.get("streaming"):
+                if not token_streams.finished(stream_id):
+                    return no_update, False
+                store_stream_result(msg)
+                return new_conversation, no_update
+        return no_update, no_update
 
     # -------------------------------------------------------------------------------
-    # This clears the conversation.
+    # This clears the conversation, cancelling the answer being generated.
     # -------------------------------------------------------------------------------
     @callback(
         Output("conversation-store", "data", allow_duplicate=True),
         Input("new-chat-btn", "n_clicks"),
+        State("conversation-store", "data"),
         prevent_initial_call=True
     )
-    def new_chat(n_clicks):
+    def new_chat(n_clicks, conversation):
+        for msg in conversation or []:
+            if msg.get("job_id"):
+                answer_jobs.cancel(msg["job_id"])
+            if msg.get("streaming"):
+                token_streams.cancel(msg["stream_id"])
+            if msg.get("session_id"):
+                chat_sessions.end(msg["session_id"])
         return []
     
     # -------------------------------------------------------------------------------
-    # Upload a document then: (In the future will parallel storing the document and 
-    #                           processing the content)
+    # Upload documents then:
     #   1. Store the document content.
-    #   2. Transform the document content to chunks of text.
-    #   3. Embed the chunks of text using Ollama and save the embeddings to Milvus.
+    #   2. Run the ingestion pipeline: convert, chunk, embed and bulk insert into Milvus,
+    #      with the stages overlapping across files.
     # -------------------------------------------------------------------------------
     @callback(
         Output("alert-store", "data"),
@@ -230,9 +351,8 @@ def register_callbacks(*args):
                 file_bytes = base64.b64decode(content_string)
 
                 file_path = save_uploaded_file(file_bytes, filename, UPLOAD_FOLDER)
-                text = to_text(file_path)
-
-                data_list.append({"text": text, "file_path": file_path})
+                # Conversion happens inside the ingestion pipeline
+                data_list.append({"file_path": file_path})
 
             res = insert_batch(args[0], data_list, collection_name="documents")
             return res
@@ -263,20 +383,22 @@ def register_callbacks(*args):
 def add_transcribed(n_clicks, recording_state, conversation):
     if recording_state is False:  # Only process after recording has stopped
         filepath = "/home/tuquan/rag_ui/src/rag_ui/data/audio/recorded_audio.wav"
-        enhanced_path = "/home/tuquan/rag_ui/src/rag_ui/data/audio/enhanced.wav"
         
         # Check if the file exists before processing
         if os.path.exists(filepath):
-            enhance(filepath, enhanced_path)
+            # Enhanced audio stays in memory and is sent to whisper as bytes
+            enhanced_wav = enhance(filepath)
             
-            transcribed = whisper_api(enhanced_path)
+            transcribed = whisper_api(enhanced_wav)
             
             if not transcribed or not transcribed.strip():
                 return no_update
                 
             new_conversation = list(conversation) if conversation else []
             # Append the user's message.
-            new_conversation.append({"role": "user", "content": transcribed})
+            new_conversation.append(
+                {"role": "user", "content": transcribed, "session_id": get_session_id(conversation)}
+            )
             # Append a placeholder assistant response, marked as loading.
             new_conversation.append({"role": "assistant", "content": "", "loading": True})
             
@@ -284,6 +406,19 @@ def add_transcribed(n_clicks, recording_state, conversation):
     
     return no_update
 
+# -------------------------------------------------------------------------------
+# Client side streaming callback, follows the answer's server-sent events
+# -------------------------------------------------------------------------------
+clientside_callback(
+    ClientsideFunction(
+        namespace='streaming',
+        function_name='followStream'
+    ),
+    Output("stream-done", "data"),
+    Input("stream-store", "data"),
+    prevent_initial_call=True
+)
+
 # -------------------------------------------------------------------------------
 # Client side recording callback
 # -------------------------------------------------------------------------------
@@ -1,26 +1,26 @@
 import dash
-from ollama import Client
 
 from rag_ui.ui.pages.rag.callbacks import register_callbacks
 from rag_ui.ui.pages.rag.layout import layout as rag_layout
-from rag_ui.db.vectorstore import init_milvus_client, create_collection
+from rag_ui.db.vectorstore import init_vector_store, create_collection
 from rag_ui.core.config import config
-
-OLLAMA_HOST = config.OLLAMA_NGROK_URL
+from rag_ui.inference.session import chat_options
+from rag_ui.inference.gateway import ollama_client
 
 dash.register_page(__name__, path='/')
 
-milvus_client = init_milvus_client()
-create_collection(milvus_client, "documents", config.EMBEDDING_DIM)
+vector_store = init_vector_store()
+create_collection(vector_store, "documents", config.EMBEDDING_DIM)
 
 layout = rag_layout
 
-ollama_client = Client(host=OLLAMA_HOST)
-# Seed ollama
+# Seed ollama, every call goes through the inference gateway
 ollama_client.chat(
     model=config.LLM_MODEL,
     messages=[
         {"role": "user", "content": "Xin chào"},
-    ]
+    ],
+    keep_alive=config.CHAT_KEEP_ALIVE,
+    options=chat_options()
 )
-register_callbacks(milvus_client, ollama_client)
\ No newline at end of file
+register_callbacks(vector_store, ollama_client)
\ No newline at end of file
@@ -86,6 +86,9 @@ layout = html.Div(
         dcc.Store(id="recording-store", data=False),
         dcc.Store(id="raw-path", data="./src/rag_ui/data/audio/recorded_audio.wav"),
         dcc.Store(id="search-product-mode", data=False),
+        dcc.Store(id="stream-store", data=None), # Id of the answer being streamed
+        dcc.Store(id="stream-done", data=None), # Set by the browser when the stream ends
+        dcc.Interval(id="answer-poll", interval=500, disabled=True), # Polls the pending answer job
         # dcc.Store(id="database-mode", data=False),
         # dcc.Store(id="database-url", data=""),
 
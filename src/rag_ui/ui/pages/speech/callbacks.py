@@ -7,7 +7,6 @@ from rag_ui.core.modules.speech_enhance import enhance
 from rag_ui.inference.whisper import whisper_api
 
 AUDIO_FOLDER = "./src/rag_ui/data/audio/"
-enhanced_audio_path = AUDIO_FOLDER + "enhanced_audio.wav"
 
 def register_callbacks():
     # -------------------------------------------------------------------------------
@@ -80,9 +79,9 @@ def register_callbacks():
     )
     def enhance_audio(n_clicks, has_raw_audio, raw_audio_path):
         if has_raw_audio:
-            enhance(raw_audio_path, enhanced_audio_path)
-            with open(enhanced_audio_path, 'rb') as audio_file:
-                encoded_audio = base64.b64encode(audio_file.read()).decode()
+            # No shared output file: the player's data URI is the only copy
+            enhanced_wav = enhance(raw_audio_path)
+            encoded_audio = base64.b64encode(enhanced_wav).decode()
             audio_src = f"data:audio/wav;base64,{encoded_audio}"
             return True, audio_src
         return False, None
@@ -109,11 +108,13 @@ def register_callbacks():
         Output("transcription-results-store", "data", allow_duplicate=True),
         Input("transcribe-clean-btn", "n_clicks"),
         State("enhanced-audio-state", "data"),
+        State("enhanced-audio-player", "src"),
         prevent_initial_call=True
     )
-    def transcribe_clean(n_clicks, has_clean_audio):
-        if has_clean_audio:
-            transcribed = whisper_api(enhanced_audio_path)
+    def transcribe_clean(n_clicks, has_clean_audio, enhanced_audio_src):
+        if has_clean_audio and enhanced_audio_src:
+            _, content_string = enhanced_audio_src.split(",")
+            transcribed = whisper_api(base64.b64decode(content_string))
             return transcribed
         return no_update
     
@@ -0,0 +1,22 @@
+import os
+import atexit
+import shutil
+import tempfile
+
+# The caches, manifest and indexes are created when their modules are imported,
+# keep them out of the source tree
+_data_dir = tempfile.mkdtemp(prefix="rag_ui-tests-")
+atexit.register(shutil.rmtree, _data_dir, ignore_errors=True)
+for name, path in {
+    "CONVERSION_CACHE_DIR": "conversion-cache",
+    "THUMBNAIL_CACHE_DIR": "thumbnail-cache",
+    "EMBED_CACHE_PATH": "embedding-cache.sqlite",
+    "WEB_CACHE_PATH": "web-cache.sqlite",
+    "INGEST_MANIFEST_PATH": "manifest.sqlite",
+    "LEXICAL_INDEX_DIR": "lexical",
+    "VECTOR_STORE_DIR": "vectors",
+}.items():
+    os.environ.setdefault(name, os.path.join(_data_dir, path))
+# Nothing is requested from these, the modules only build their urls on import
+for name in ("EMBED_NGROK_URL", "OLLAMA_NGROK_URL", "WHISPER_NGROK_URL"):
+    os.environ.setdefault(name, "http://localhost")
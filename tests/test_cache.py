@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+
+from rag_ui.data.cache import DiskCache, RetrievalCache
+
+def search_results(text="a"):
+    return [[{"id": 1, "distance": 0.9, "entity": {"text": text, "vector": np.ones(4, dtype=np.float32)}}]]
+
+def test_retrieval_cache_hit_returns_a_copy():
+    cache = RetrievalCache(max_entries=8)
+    key = cache.make_key("docs", [1.0, 0.0], 3, None, ["text"])
+    assert cache.get(key) is None
+    cache.put(key, search_results())
+    hit = cache.get(key)
+    hit[0][0]["entity"]["text"] = "changed"
+    hit[0][0]["entity"]["vector"][:] = 0
+    again = cache.get(key)
+    assert again[0][0]["entity"]["text"] == "a"
+    assert again[0][0]["entity"]["vector"].sum() == 4
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+def test_retrieval_cache_key_ignores_the_vector_scale():
+    cache = RetrievalCache(max_entries=8)
+    assert cache.make_key("docs", [1.0, 2.0], 3, None, ["text"]) == cache.make_key("docs", [2.0, 4.0], 3, None, ["text"])
+    assert cache.make_key("docs", [1.0, 2.0], 3, None, ["text"]) != cache.make_key("docs", [1.0, 2.0], 5, None, ["text"])
+
+def test_retrieval_cache_bump_drops_the_collection():
+    cache = RetrievalCache(max_entries=8)
+    docs = cache.make_key("docs", [1.0, 0.0], 3, None, ["text"])
+    other = cache.make_key("other", [1.0, 0.0], 3, None, ["text"])
+    cache.put(docs, search_results())
+    cache.put(other, search_results())
+    cache.bump("docs")
+    assert cache.epoch("docs") == 1
+    assert cache.get(docs) is None
+    assert cache.get(cache.make_key("docs", [1.0, 0.0], 3, None, ["text"])) is None
+    assert cache.get(other) is not None
+
+def test_retrieval_cache_put_after_a_write_is_dropped():
+    # The search started before the write, its results may miss the new rows
+    cache = RetrievalCache(max_entries=8)
+    key = cache.make_key("docs", [1.0, 0.0], 3, None, ["text"])
+    cache.bump("docs")
+    cache.put(key, search_results("stale"))
+    assert cache.get(key) is None
+    assert cache.get(cache.make_key("docs", [1.0, 0.0], 3, None, ["text"])) is None
+
+def test_retrieval_cache_evicts_least_recently_used():
+    cache = RetrievalCache(max_entries=2)
+    keys = [cache.make_key("docs", [1.0, float(i)], 3, None, ["text"]) for i in range(3)]
+    cache.put(keys[0], search_results())
+    cache.put(keys[1], search_results())
+    cache.get(keys[0])
+    cache.put(keys[2], search_results())
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+
+def test_disk_cache_evicts_to_max_bytes(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    for i in range(5):
+        cache.put_bytes(f"k{i}", bytes(300))
+    cache.get_bytes("k2")
+    cache.put_bytes("k5", bytes(300))
+    assert cache.get_bytes("k3") is None
+    assert cache.get_bytes("k2") is not None
+    stats = cache.stats()
+    assert stats["bytes"] == 900
+    assert stats["bytes"] == sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+
+def test_disk_cache_replacing_a_key_counts_its_new_size(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.put_bytes("k", bytes(600))
+    cache.put_bytes("k", bytes(100))
+    cache.put_bytes("j", bytes(800))
+    assert cache.stats()["bytes"] == 900
+    assert cache.stats()["evictions"] == 0
+
+def test_disk_cache_shared_directory(tmp_path):
+    first = DiskCache(str(tmp_path), max_bytes=1000)
+    first.put_bytes("k", b"data")
+    # Loaded from the directory on startup
+    assert DiskCache(str(tmp_path), max_bytes=1000).stats()["bytes"] == 4
+    # Written by another process after startup
+    second = DiskCache(str(tmp_path), max_bytes=1000)
+    first.put_bytes("j", b"more")
+    assert second.get_bytes("j") == b"more"
+    assert second.stats()["bytes"] == 8
+    # Evicted by another process
+    os.remove(tmp_path / ("k" + DiskCache.SUFFIX))
+    assert second.get_bytes("k") is None
+    assert second.stats()["bytes"] == 4
@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+import pytest
+
+# Document conversion needs the converters, the pipeline is only fed text here
+pytest.importorskip("markitdown")
+pytest.importorskip("marker")
+
+from rag_ui.db import ingest
+from rag_ui.db.ingest import IngestionPipeline
+from rag_ui.db.lexical import LexicalIndex
+from rag_ui.db.manifest import IngestManifest
+from rag_ui.db.store import NumpyStore, FILE_PATH_MAX_BYTES
+
+DIM = 4
+
+def fake_embed(texts):
+    return [np.random.default_rng(len(text)).normal(size=DIM) for text in texts]
+
+def document(file_path, n_paragraphs=10, version=0):
+    return {"file_path": file_path, "text": "\n\n".join(f"paragraph {i} v{version} of {file_path}" for i in range(n_paragraphs))}
+
+class BrokenManifest:
+    def get(self, collection_name, file_path):
+        raise RuntimeError("manifest unavailable")
+
+    def put(self, *args):
+        raise RuntimeError("manifest unavailable")
+
+class BrokenLexicalIndex:
+    def add(self, rows):
+        raise RuntimeError("lexical index unavailable")
+
+    def remove(self, *args):
+        pass
+
+    def save(self):
+        raise RuntimeError("lexical index unavailable")
+
+@pytest.fixture(autouse=True)
+def embed(monkeypatch):
+    monkeypatch.setattr(ingest, "embed_api", fake_embed)
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyStore(str(tmp_path / "vectors"))
+    store.create_collection("docs", DIM)
+    return store
+
+def make_pipeline(store, tmp_path, manifest=None, lexical_index=None):
+    # Small batches and queues so every stage has to wait on the next one
+    pipeline = IngestionPipeline(
+        store, "docs", embed_workers=2, embed_batch_size=2, insert_batch_size=4, queue_size=1,
+        manifest=manifest or IngestManifest(str(tmp_path / "manifest.sqlite")),
+    )
+    pipeline.lexical_index = lexical_index or LexicalIndex(str(tmp_path / "lexical"))
+    return pipeline
+
+def run(pipeline, documents):
+    thread = threading.Thread(target=pipeline.run, args=(documents,), daemon=True)
+    thread.start()
+    thread.join(30)
+    assert not thread.is_alive(), "ingestion is stuck"
+
+def error_stages(pipeline):
+    return {error.split(":")[0] for error in pipeline.errors}
+
+def test_ingest_and_reingest(store, tmp_path):
+    pipeline = make_pipeline(store, tmp_path)
+    run(pipeline, [document("a.md"), document("b.md")])
+    assert pipeline.errors == []
+    assert pipeline.inserted == store.count("docs") == 20
+    assert len(pipeline.lexical_index) == 20
+
+    pipeline = make_pipeline(store, tmp_path)
+    run(pipeline, [document("a.md"), document("b.md", n_paragraphs=5, version=1)])
+    assert pipeline.skipped == 1
+    assert (pipeline.inserted, pipeline.removed) == (5, 10)
+    assert store.count("docs") == 15
+
+def test_embed_errors_are_retried_on_the_next_run(store, tmp_path, monkeypatch):
+    calls = []
+
+    def flaky_embed(texts):
+        calls.append(texts)
+        if len(calls) == 2:
+            raise RuntimeError("embedder unavailable")
+        return fake_embed(texts)
+
+    monkeypatch.setattr(ingest, "embed_api", flaky_embed)
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    pipeline = make_pipeline(store, tmp_path, manifest=manifest)
+    run(pipeline, [document("a.md")])
+    assert error_stages(pipeline) == {"embed"}
+    assert pipeline.inserted == 8
+    # Incomplete, the file is not skipped next time
+    assert manifest.get("docs", "a.md")[0] is None
+
+    pipeline = make_pipeline(store, tmp_path, manifest=manifest)
+    run(pipeline, [document("a.md")])
+    assert pipeline.errors == []
+    assert pipeline.inserted == 2
+    assert store.count("docs") == 10
+
+def test_store_errors_do_not_block_the_pipeline(store, tmp_path, monkeypatch):
+    def insert(collection_name, rows):
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(store, "insert", insert)
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    pipeline = make_pipeline(store, tmp_path, manifest=manifest)
+    run(pipeline, [document(f"{i}.md") for i in range(10)])
+    assert error_stages(pipeline) == {"write"}
+    assert pipeline.inserted == 0
+    assert manifest.get("docs", "0.md") == (None, set())
+
+def test_manifest_errors_do_not_block_the_pipeline(store, tmp_path):
+    pipeline = make_pipeline(store, tmp_path, manifest=BrokenManifest())
+    run(pipeline, [document(f"{i}.md") for i in range(10)])
+    assert error_stages(pipeline) == {"manifest", "convert"}
+    assert pipeline.inserted == 0
+
+def test_lexical_errors_keep_the_vectors(store, tmp_path):
+    pipeline = make_pipeline(store, tmp_path, lexical_index=BrokenLexicalIndex())
+    run(pipeline, [document("a.md")])
+    assert error_stages(pipeline) == {"lexical"}
+    assert pipeline.inserted == store.count("docs") == 10
+
+def test_long_paths_are_rejected(store, tmp_path):
+    pipeline = make_pipeline(store, tmp_path)
+    run(pipeline, [document("a" * (FILE_PATH_MAX_BYTES + 1)), document("b.md")])
+    assert error_stages(pipeline) == {"chunk"}
+    assert pipeline.inserted == 10
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from rag_ui.db.lexical import LexicalIndex, tokenize, score_fusion
+
+def rows(file_path, texts):
+    return [{"file_path": file_path, "chunk_hash": f"h{i}", "text": text} for i, text in enumerate(texts)]
+
+def keys(hits):
+    return [(hit["file_path"], hit["chunk_hash"]) for hit in hits]
+
+def saved_rows(index):
+    with sqlite3.connect(index._db_path) as conn:
+        return conn.execute("SELECT file_path, chunk_hash FROM chunks ORDER BY file_path, chunk_hash").fetchall()
+
+def test_tokenize_keeps_compound_identifiers():
+    assert tokenize("Giá SKU-4821 bao nhiêu?") == ["giá", "sku-4821", "sku", "4821", "bao", "nhiêu"]
+
+def test_search_ranks_by_bm25(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", ["warranty of the SKU-4821 blender", "delivery times", "warranty terms, warranty claims"]))
+    hits = index.search("SKU-4821")
+    assert keys(hits) == [("a.md", "h0")]
+    assert keys(index.search("warranty"))[0] == ("a.md", "h2")
+    assert index.search("nothing matches") == []
+    assert index.search("") == []
+    assert set(hits[0]) == {"file_path", "chunk_hash", "score"}
+
+def test_add_skips_indexed_chunks(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", ["one", "two"]))
+    index.add(rows("a.md", ["one", "two"]))
+    assert len(index) == 2
+
+def test_remove(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", ["red apple", "green apple", "apple pie"]))
+    index.add(rows("b.md", ["apple juice"]))
+    index.remove("a.md", ["h0"])
+    assert ("a.md", "h0") not in keys(index.search("apple"))
+    assert len(index) == 3
+    index.remove("a.md")
+    assert keys(index.search("apple")) == [("b.md", "h0")]
+
+def test_compaction_keeps_the_remaining_chunks(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", [f"common word{i}" for i in range(100)]))
+    index.remove("a.md", [f"h{i}" for i in range(60)])
+    # Removed chunks are dropped from the postings once they are a quarter of the index
+    assert len(index._docs) < 100
+    assert len(index) == 40
+    assert keys(index.search("word75")) == [("a.md", "h75")]
+    assert len(index.search("common", top_k=100)) == 40
+
+def test_save_and_load(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", ["red apple", "green apple", "banana bread"]))
+    index.remove("a.md", ["h1"])
+    index.save()
+    loaded = LexicalIndex(str(tmp_path))
+    assert len(loaded) == 2
+    assert keys(loaded.search("apple")) == [("a.md", "h0")]
+    assert loaded.search("banana")[0]["score"] == pytest.approx(index.search("banana")[0]["score"])
+
+def test_save_writes_only_the_changes(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", ["one", "two"]))
+    index.save()
+    assert index._added == {} and index._deleted == set()
+    index.add(rows("b.md", ["three"]))
+    index.remove("a.md", ["h0"])
+    assert list(index._added) == [("b.md", "h0")]
+    assert index._deleted == {("a.md", "h0")}
+    index.save()
+    assert saved_rows(index) == [("a.md", "h1"), ("b.md", "h0")]
+    # Added and removed before a save, nothing to write
+    index.add(rows("c.md", ["four"]))
+    index.remove("c.md")
+    index.save()
+    assert saved_rows(index) == [("a.md", "h1"), ("b.md", "h0")]
+
+def test_clear(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add(rows("a.md", ["one"]))
+    index.save()
+    index.clear()
+    assert len(index) == 0
+    assert len(LexicalIndex(str(tmp_path))) == 0
+
+def test_score_fusion_keeps_the_bm25_margin():
+    similarities = {"code": 0.5, "topic": 0.6, "other": 0.55}
+    fused = score_fusion(similarities, {"code": 12.0, "topic": 1.0}, alpha=0.5)
+    assert max(fused, key=fused.get) == "code"
+    assert fused["code"] == pytest.approx(0.5 * 0.5 + 0.5)
+    assert fused["other"] == pytest.approx(0.5 * 0.55)
+    # Without BM25 hits the ranking is the vector one
+    assert score_fusion(similarities, {}) == pytest.approx({key: 0.5 * value for key, value in similarities.items()})
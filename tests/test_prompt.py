@@ -0,0 +1,59 @@
+import pytest
+
+from rag_ui.inference.prompt import pack_context
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # About 4 characters per token without a tokenizer
+    monkeypatch.setenv("TOKENIZER_NAME", "")
+
+def words(prefix, n):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+def test_everything_fits():
+    history, context, turns, counts = pack_context(["question?", "earlier"], ["chunk one", "chunk two"], 1000)
+    assert history == ["question?", "earlier"]
+    assert context == "chunk one\nchunk two"
+    assert turns is None
+    assert counts["chunks"] == 2
+    assert counts["total"] == counts["question"] + counts["history"] + counts["context"]
+
+def test_chunks_come_before_past_messages():
+    chunk = "x" * 400  # 100 tokens
+    history, context, _, counts = pack_context(["q" * 40, "p" * 200], [chunk, chunk + "y"], 230)
+    assert history == ["q" * 40]
+    assert context == f"{chunk}\n{chunk}y"
+    assert counts["dropped_messages"] == 1
+
+def test_chunks_that_no_longer_fit_are_skipped():
+    chunks = ["a" * 400, "b" * 400, "c" * 40]
+    _, context, _, counts = pack_context(["q" * 40], chunks, 150)
+    assert context == "a" * 400 + "\n" + "c" * 40
+    assert counts["dropped_chunks"] == 1
+    assert counts["total"] <= 150
+
+def test_first_chunk_is_truncated():
+    _, context, _, counts = pack_context(["q" * 40], ["a" * 4000], 110)
+    assert context == "a" * 400
+    assert counts["context"] == 100
+    assert counts["chunks"] == 1
+
+def test_duplicate_chunks_are_skipped():
+    chunk = words("w", 50)
+    _, context, _, counts = pack_context(["question"], [chunk, chunk + " w50", words("v", 50)], 10000)
+    assert context == chunk + "\n" + words("v", 50)
+    assert counts["duplicate_chunks"] == 1
+
+def test_turns_are_windowed():
+    turns = [
+        {"role": "user", "content": "u" * 400},
+        {"role": "assistant", "content": "a" * 400},
+        {"role": "user", "content": "u" * 40},
+        {"role": "assistant", "content": "a" * 40},
+    ]
+    history, _, kept, counts = pack_context(["question", "ignored"], [], 100, turns=turns)
+    # Past user messages come from the turns
+    assert history == ["question"]
+    assert kept == turns[2:]
+    assert counts["history"] == 20
+    assert counts["dropped_messages"] == 2
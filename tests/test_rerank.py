@@ -0,0 +1,33 @@
+import numpy as np
+
+from rag_ui.inference.rerank import mmr_select, normalize_rows
+
+def test_normalize_rows_leaves_zero_rows():
+    rows = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+    np.testing.assert_allclose(rows, [[0.6, 0.8], [0.0, 0.0]])
+
+def test_relevance_only_is_the_similarity_ranking():
+    query = [1.0, 0.0]
+    vectors = [[0.5, 0.5], [1.0, 0.1], [0.0, 1.0]]
+    assert mmr_select(query, vectors, k=3, lambda_=1.0) == [1, 0, 2]
+
+def test_skips_near_duplicates():
+    query = [1.0, 0.0, 0.0]
+    vectors = [[1.0, 0.1, 0.0], [1.0, 0.1, 0.001], [0.8, 0.0, 0.6]]
+    assert mmr_select(query, vectors, k=2, lambda_=0.5) == [0, 2]
+
+def test_explicit_relevance():
+    query = [1.0, 0.0]
+    vectors = [[1.0, 0.0], [0.0, 1.0]]
+    assert mmr_select(query, vectors, k=1, relevance=[0.1, 0.9]) == [1]
+
+def test_token_budget():
+    query = [1.0, 0.0]
+    vectors = [[1.0, 0.0], [0.9, 0.1], [0.8, 0.2]]
+    # The second best no longer fits after the first, the third does
+    assert mmr_select(query, vectors, k=3, lambda_=1.0, token_counts=[60, 50, 30], token_budget=100) == [0, 2]
+    assert mmr_select(query, vectors, k=3, token_counts=[200, 200, 200], token_budget=100) == []
+
+def test_empty():
+    assert mmr_select([1.0, 0.0], np.zeros((0, 2)), k=3) == []
+    assert mmr_select([1.0, 0.0], [[1.0, 0.0]], k=0) == []
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from rag_ui.core.modules.speech_enhance import kalman_filter, kalman_filter_loop
+
+def noisy_tone(n_samples, sr=16000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / sr
+    return 0.5 * np.sin(2 * np.pi * 220 * t) + 0.1 * rng.standard_normal(n_samples)
+
+@pytest.mark.parametrize("Q, R", [(0.01, 0.1), (1e-4, 0.1), (0.1, 0.01), (1e-6, 1.0), (1.0, 1e-3)])
+@pytest.mark.parametrize("n_samples", [1, 2, 17, 1000, 50000])
+def test_exact_mode_matches_loop(Q, R, n_samples):
+    y = noisy_tone(n_samples)
+    np.testing.assert_allclose(
+        kalman_filter(y, Q, R, mode="exact"), kalman_filter_loop(y, Q, R), rtol=1e-9, atol=1e-12
+    )
+
+def test_exact_mode_matches_loop_on_float32_input():
+    # The loop keeps its covariance in float32 for float32 input
+    y = noisy_tone(20000).astype(np.float32)
+    np.testing.assert_allclose(kalman_filter(y, mode="exact"), kalman_filter_loop(y), rtol=1e-5, atol=1e-6)
+
+def test_steady_mode_converges_to_loop():
+    y = noisy_tone(20000)
+    np.testing.assert_allclose(kalman_filter(y, mode="steady")[5000:], kalman_filter_loop(y)[5000:], rtol=1e-9, atol=1e-12)
+
+def test_empty_input():
+    assert kalman_filter(np.array([])).shape == (0,)
+    assert kalman_filter([]).shape == (0,)
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        kalman_filter(noisy_tone(10), mode="fast")
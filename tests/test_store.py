@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from rag_ui.db.store import NumpyStore
+
+DIM = 8
+
+def make_rows(file_path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"vector": rng.normal(size=DIM), "text": f"{file_path} chunk {i}", "file_path": file_path, "chunk_hash": f"h{i}"}
+        for i in range(n)
+    ]
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyStore(str(tmp_path))
+    store.create_collection("docs", DIM)
+    return store
+
+def test_search_finds_the_nearest_rows(store):
+    rows = make_rows("a.md", 20)
+    assert store.insert("docs", rows) == 20
+    assert store.count("docs") == 20
+    hits = store.search("docs", [rows[7]["vector"], rows[3]["vector"]], 3, ["text", "chunk_hash"])
+    assert [hits[0][0]["entity"]["text"], hits[1][0]["entity"]["text"]] == ["a.md chunk 7", "a.md chunk 3"]
+    assert hits[0][0]["distance"] == pytest.approx(1.0, abs=1e-5)
+    assert [hit["distance"] for hit in hits[0]] == sorted((hit["distance"] for hit in hits[0]), reverse=True)
+
+def test_search_returns_unit_vectors(store):
+    rows = make_rows("a.md", 5)
+    store.insert("docs", rows)
+    hit = store.search("docs", [rows[2]["vector"]], 1, ["vector"])[0][0]
+    expected = rows[2]["vector"] / np.linalg.norm(rows[2]["vector"])
+    np.testing.assert_allclose(hit["entity"]["vector"], expected, rtol=1e-5)
+
+def test_search_filter(store):
+    store.insert("docs", make_rows("a.md", 10, seed=1))
+    b_rows = make_rows("b.md", 10, seed=2)
+    store.insert("docs", b_rows)
+    store.insert("docs", make_rows("c.md", 10, seed=3))
+    hits = store.search("docs", [b_rows[0]["vector"]], 30, ["file_path"], filter={"file_path": "a.md"})[0]
+    assert len(hits) == 10
+    assert {hit["entity"]["file_path"] for hit in hits} == {"a.md"}
+    hits = store.search("docs", [b_rows[0]["vector"]], 30, ["file_path"], filter={"file_path": ["a.md", "c.md"]})[0]
+    assert {hit["entity"]["file_path"] for hit in hits} == {"a.md", "c.md"}
+    with pytest.raises(ValueError):
+        store.search("docs", [b_rows[0]["vector"]], 3, ["text"], filter={"vector": 1})
+
+def test_delete(store):
+    a_rows = make_rows("a.md", 10, seed=1)
+    store.insert("docs", a_rows)
+    store.insert("docs", make_rows("b.md", 10, seed=2))
+    store.delete("docs", "a.md", ["h1", "h2"])
+    assert store.count("docs") == 18
+    hits = store.search("docs", [a_rows[1]["vector"]], 20, ["file_path", "chunk_hash"])[0]
+    assert ("a.md", "h1") not in {(hit["entity"]["file_path"], hit["entity"]["chunk_hash"]) for hit in hits}
+    assert len(hits) == 18
+    store.delete("docs", "b.md")
+    assert store.count("docs") == 8
+    assert not store.search("docs", [a_rows[0]["vector"]], 3, ["text"], filter={"file_path": "b.md"})[0]
+
+def test_query(store):
+    store.insert("docs", make_rows("a.md", 5))
+    store.insert("docs", make_rows("b.md", 5))
+    rows = store.query("docs", {"chunk_hash": ["h1", "h3"]}, ["file_path", "chunk_hash", "text"])
+    assert sorted((row["file_path"], row["chunk_hash"]) for row in rows) == [
+        ("a.md", "h1"), ("a.md", "h3"), ("b.md", "h1"), ("b.md", "h3")
+    ]
+
+def test_reopen(store, tmp_path):
+    rows = make_rows("a.md", 30)
+    store.insert("docs", rows)
+    store.delete("docs", "a.md", ["h0"])
+    reopened = NumpyStore(str(tmp_path))
+    assert reopened.has_collection("docs")
+    assert reopened.count("docs") == 29
+    hit = reopened.search("docs", [rows[5]["vector"]], 1, ["text"])[0][0]
+    assert hit["entity"]["text"] == "a.md chunk 5"
+    # Writes from another store on the same directory are picked up
+    reopened.insert("docs", make_rows("b.md", 5, seed=4))
+    assert store.count("docs") == 34
+
+def test_ivf_search(tmp_path):
+    store = NumpyStore(str(tmp_path), ivf_lists=4, nprobe=4, ivf_min_rows=100)
+    store.create_collection("docs", DIM)
+    rows = make_rows("a.md", 200)
+    store.insert("docs", rows)
+    # Probing every list is exact
+    hits = store.search("docs", [rows[42]["vector"]], 1, ["text"])[0]
+    assert store._collection("docs")._ivf is not None
+    assert hits[0]["entity"]["text"] == "a.md chunk 42"
@@ -0,0 +1,58 @@
+import io
+from urllib.parse import quote
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from rag_ui.core.modules import thumbnail
+from rag_ui.core.modules.thumbnail import load_secret, make_thumbnail, sign_url, thumbnail_url, verify_url
+
+URL = "https://shop.example/images/p1.png?w=1200"
+
+def test_signed_url_is_verified():
+    assert verify_url(URL, sign_url(URL))
+    assert thumbnail_url(URL) == f"/thumbnail/{sign_url(URL)}?url={quote(URL, safe='')}"
+    assert thumbnail_url("") == ""
+
+def test_tampered_url_or_signature_is_rejected():
+    signature = sign_url(URL)
+    assert not verify_url(URL + "&x=1", signature)
+    assert not verify_url(URL, signature[:-1] + ("0" if signature[-1] != "0" else "1"))
+    assert not verify_url(URL, "")
+
+def test_only_http_urls_are_verified():
+    for url in ("file:///etc/passwd", "ftp://shop.example/p1.png"):
+        assert not verify_url(url, sign_url(url))
+
+def test_signature_depends_on_the_secret(monkeypatch):
+    signature = sign_url(URL)
+    monkeypatch.setattr(thumbnail, "THUMBNAIL_SECRET", b"another secret")
+    assert not verify_url(URL, signature)
+
+def test_generated_secret_is_kept(monkeypatch, tmp_path):
+    monkeypatch.setenv("THUMBNAIL_SECRET", "")
+    monkeypatch.setenv("THUMBNAIL_CACHE_DIR", str(tmp_path))
+    secret = load_secret()
+    assert len(secret) == 64
+    assert load_secret() == secret
+    assert (tmp_path / thumbnail.SECRET_FILE).read_bytes().strip() == secret
+    assert [path.name for path in tmp_path.iterdir()] == [thumbnail.SECRET_FILE]
+
+def test_configured_secret_wins(monkeypatch, tmp_path):
+    monkeypatch.setenv("THUMBNAIL_SECRET", "shared")
+    monkeypatch.setenv("THUMBNAIL_CACHE_DIR", str(tmp_path))
+    assert load_secret() == b"shared"
+    assert not (tmp_path / thumbnail.SECRET_FILE).exists()
+
+def test_make_thumbnail():
+    image = Image.new("RGBA", (800, 400), (255, 0, 0, 0))
+    image.paste((0, 0, 255, 255), (0, 0, 400, 400))
+    data = io.BytesIO()
+    image.save(data, "PNG")
+    with Image.open(io.BytesIO(make_thumbnail(data.getvalue(), 200))) as small:
+        assert small.format == "JPEG"
+        assert small.size == (200, 100)
+        # Transparent areas become white
+        assert all(channel > 240 for channel in small.getpixel((180, 50)))
+        assert small.getpixel((20, 50))[2] > 200